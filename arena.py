@@ -0,0 +1,220 @@
+import io
+import json
+import logging
+import math
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import chess
+import chess.pgn
+
+GameResult = namedtuple('GameResult', ['game_id', 'pgn', 'stats'])
+EloEstimate = namedtuple('EloEstimate', ['games', 'wins', 'draws', 'losses', 'score', 'elo', 'margin'])
+
+class RandomPlayer:
+    """Baseline that plays a uniformly random legal move."""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def best_move(self, board, time_limit=None):
+        moves = list(board.legal_moves)
+        return self.rng.choice(moves) if moves else None
+
+def make_player(spec, seed=None):
+    """Build a player from a spec string.
+
+    Specs are "random", "material" (alpha-beta on material only) or
+    "policy:MODEL", "alphabeta:MODEL" and "mcts:MODEL", where MODEL is a
+    saved Keras model; its idx_to_move.json is read from the same
+    directory when present.
+    """
+    kind, _, model_path = spec.partition(":")
+    if kind == "random":
+        return RandomPlayer(seed)
+    if kind == "material":
+        from search import AlphaBetaSearch
+        return AlphaBetaSearch()
+    if kind not in ("policy", "alphabeta", "mcts") or not model_path:
+        raise ValueError(f"Unknown player spec {spec!r}")
+
+    from engine import MoveEngine
+    mapping_path = os.path.join(os.path.dirname(model_path), "idx_to_move.json")
+    player = MoveEngine(model_path, mapping_path if os.path.exists(mapping_path) else None)
+    if kind == "alphabeta":
+        from search import AlphaBetaSearch
+        player = AlphaBetaSearch(policy=player)
+    elif kind == "mcts":
+        from mcts import MCTS
+        player = MCTS(policy=player)
+    return player
+
+def random_opening(plies, seed):
+    """Return a board after `plies` random legal moves (stopping early if the game ends)."""
+    rng = random.Random(seed)
+    board = chess.Board()
+    for _ in range(plies):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        board.push(rng.choice(moves))
+    return board
+
+def elo_difference(score):
+    """Elo difference implied by an expected score in (0, 1)."""
+    if score <= 0.0:
+        return -math.inf
+    if score >= 1.0:
+        return math.inf
+    return 400.0 * math.log10(score / (1.0 - score))
+
+def elo_estimate(wins, draws, losses):
+    """Estimate the Elo difference of a player from its match record, with a 95% margin."""
+    games = wins + draws + losses
+    if not games:
+        return EloEstimate(0, 0, 0, 0, 0.5, 0.0, math.inf)
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1.0 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    stderr = math.sqrt(variance / games)
+    low, high = elo_difference(score - 1.96 * stderr), elo_difference(score + 1.96 * stderr)
+    return EloEstimate(games, wins, draws, losses, score, elo_difference(score), (high - low) / 2)
+
+# Per-process state, set up once by _init_worker so each worker loads its models a single time
+_PLAYERS = None
+_SPECS = None
+
+def _init_worker(spec_a, spec_b, seed):
+    global _PLAYERS, _SPECS
+    logging.getLogger().setLevel(logging.WARNING)  # Keep per-move search logs out of the arena output
+    player_a = make_player(spec_a, seed)
+    player_b = player_a if spec_b == spec_a else make_player(spec_b, seed)
+    _PLAYERS = (player_a, player_b)
+    _SPECS = (spec_a, spec_b)
+
+def _play_game(args):
+    """Worker job: play one game from a random opening and return a GameResult."""
+    game_id, a_is_white, opening_plies, opening_seed, think_time, max_plies = args
+    board = random_opening(opening_plies, opening_seed)
+    opening = [move.uci() for move in board.move_stack]
+    white, black = (0, 1) if a_is_white else (1, 0)
+    move_times = ([], [])  # Seconds per move for player A and player B
+
+    start = time.perf_counter()
+    while board.outcome(claim_draw=True) is None and board.ply() < max_plies:
+        side = white if board.turn == chess.WHITE else black
+        move_start = time.perf_counter()
+        move = _PLAYERS[side].best_move(board, time_limit=think_time)
+        move_times[side].append(time.perf_counter() - move_start)
+        if move is None or not board.is_legal(move):
+            raise RuntimeError(f"{_SPECS[side]} returned illegal move {move} in {board.fen()}")
+        board.push(move)
+    elapsed = time.perf_counter() - start
+
+    outcome = board.outcome(claim_draw=True)
+    result = outcome.result() if outcome is not None else "1/2-1/2"
+    termination = outcome.termination.name.lower() if outcome is not None else "max_plies"
+    a_score = {"1-0": 1.0, "0-1": 0.0}.get(result, 0.5)
+    if not a_is_white:
+        a_score = 1.0 - a_score
+
+    game = chess.pgn.Game.from_board(board)
+    game.headers["Event"] = "Arena"
+    game.headers["Round"] = str(game_id + 1)
+    game.headers["White"] = _SPECS[white]
+    game.headers["Black"] = _SPECS[black]
+    game.headers["Result"] = result
+    game.headers["Termination"] = termination
+    exporter = chess.pgn.StringExporter(headers=True, variations=False, comments=False)
+
+    stats = {
+        'game': game_id,
+        'white': _SPECS[white],
+        'black': _SPECS[black],
+        'result': result,
+        'termination': termination,
+        'a_score': a_score,
+        'plies': board.ply(),
+        'opening': opening,
+        'seconds': elapsed,
+        'a_time_per_move': sum(move_times[0]) / max(len(move_times[0]), 1),
+        'b_time_per_move': sum(move_times[1]) / max(len(move_times[1]), 1),
+        'max_time_per_move': max(move_times[0] + move_times[1], default=0.0),
+    }
+    return GameResult(game_id, game.accept(exporter), stats)
+
+def run_match(spec_a, spec_b, games, pgn_out=None, stats_out=None, workers=None, think_time=0.1,
+              opening_plies=4, max_plies=400, seed=0):
+    """Play `games` games between two players in a process pool and return A's EloEstimate.
+
+    Games are played in colour-swapped pairs from the same random opening.
+    Each worker builds both players once; finished games are appended to
+    pgn_out (PGN) and stats_out (one JSON object per line) as they
+    complete, with at most 2 * workers games in flight.
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = iter([(game_id, game_id % 2 == 0, opening_plies, seed * 1000003 + game_id // 2, think_time, max_plies)
+                 for game_id in range(games)])
+    wins = draws = losses = 0
+    start = time.perf_counter()
+
+    with (open(pgn_out, "w") if pgn_out else io.StringIO()) as pgn_file, \
+            (open(stats_out, "w") if stats_out else io.StringIO()) as stats_file, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(spec_a, spec_b, seed)) as executor:
+        in_flight = set()
+
+        def submit_next():
+            for job in jobs:
+                in_flight.add(executor.submit(_play_game, job))
+                return
+
+        for _ in range(2 * workers):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.remove(future)
+                submit_next()
+                result = future.result()
+                pgn_file.write(result.pgn + "\n\n")
+                stats_file.write(json.dumps(result.stats) + "\n")
+                score = result.stats['a_score']
+                wins += score == 1.0
+                draws += score == 0.5
+                losses += score == 0.0
+                finished = wins + draws + losses
+                if finished % 10 == 0 or finished == games:
+                    pgn_file.flush()
+                    stats_file.flush()
+                    elapsed = time.perf_counter() - start
+                    logging.info("%d/%d games (+%d =%d -%d), %.2f games/s",
+                                 finished, games, wins, draws, losses, finished / elapsed)
+
+    return elo_estimate(wins, draws, losses)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Play two engines against each other without a window.")
+    parser.add_argument("player_a", help="random, material, policy:MODEL, alphabeta:MODEL or mcts:MODEL")
+    parser.add_argument("player_b", nargs="?", default="random", help="Opponent spec (default: random)")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--think-time", type=float, default=0.1, help="Seconds per move for search engines")
+    parser.add_argument("--opening-plies", type=int, default=4, help="Random plies played before each pair")
+    parser.add_argument("--max-plies", type=int, default=400, help="Adjudicate a draw after this many plies")
+    parser.add_argument("--pgn", default="arena.pgn", help="PGN output path")
+    parser.add_argument("--stats", default="arena.jsonl", help="Per-game stats output path (JSON lines)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    estimate = run_match(args.player_a, args.player_b, args.games, pgn_out=args.pgn, stats_out=args.stats,
+                         workers=args.workers, think_time=args.think_time, opening_plies=args.opening_plies,
+                         max_plies=args.max_plies, seed=args.seed)
+    print(f"{args.player_a} vs {args.player_b}: +{estimate.wins} ={estimate.draws} -{estimate.losses} "
+          f"(score {estimate.score:.3f}, Elo {estimate.elo:+.0f} ± {estimate.margin:.0f})")
@@ -0,0 +1,316 @@
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import chess
+import chess.pgn
+import numpy as np
+
+from board_encoding import random_boards
+
+BENCHMARKS = ("parse", "encode", "train", "inference", "search", "render")
+
+def write_synthetic_pgn(path, games=500, seed=0, max_plies=120):
+    """Write games of random legal play to path, so parse benchmarks do not depend on a download."""
+    rng = np.random.default_rng(seed)
+    results = ("1-0", "0-1", "1/2-1/2")
+    with open(path, "w") as f:
+        for i in range(games):
+            board = chess.Board()
+            for _ in range(int(rng.integers(20, max_plies))):
+                moves = list(board.legal_moves)
+                if not moves:
+                    break
+                board.push(moves[rng.integers(len(moves))])
+            game = chess.pgn.Game.from_board(board)
+            game.headers["Event"] = "Synthetic"
+            game.headers["Round"] = str(i + 1)
+            game.headers["WhiteElo"] = str(int(rng.integers(2300, 2800)))
+            game.headers["BlackElo"] = str(int(rng.integers(2300, 2800)))
+            game.headers["Result"] = board.result() if board.is_game_over() else results[rng.integers(3)]
+            print(game, file=f, end="\n\n")
+    return path
+
+def bench_parse(pgn_path, workers=None):
+    """Games/sec and positions/sec of prepare_data.stream_pgn_batches on a PGN file."""
+    from prepare_data import stream_pgn_batches
+    start = time.perf_counter()
+    positions = 0
+    games = 0
+    for boards, _, meta in stream_pgn_batches(pgn_path, workers=workers, dtype=np.uint8, with_meta=True):
+        positions += len(boards)
+        games = int(meta['game_id'][-1]) + 1
+    elapsed = time.perf_counter() - start
+    return {'games_per_sec': games / elapsed, 'positions_per_sec': positions / elapsed}
+
+def bench_encode(n=20000):
+    """Positions/sec of the per-square, bitboard and batched board encoders."""
+    from board_encoding import benchmark
+    return {f'{name}_positions_per_sec': rate for name, rate in benchmark(n).items()}
+
+def _synthetic_shards(out_dir, boards, seed=0):
+    """Write boards with random labels as a sharded dataset."""
+    from board_encoding import boards_to_tensor
+    from dataset import ShardWriter
+    from move_vocab import NUM_MOVES
+    labels = np.random.default_rng(seed).integers(NUM_MOVES, size=len(boards))
+    with ShardWriter(out_dir, shard_size=1 << 14) as writer:
+        writer.add(boards_to_tensor(boards, dtype=np.uint8), labels)
+
+def build_reference_model(seed=0):
+    """An untrained model with fixed weights, so inference timings need no checkpoint."""
+    import tensorflow as tf
+    from train_chess_model import build_model
+    tf.keras.utils.set_random_seed(seed)
+    return build_model()
+
+def bench_train(examples=32768, batch_size=1024, seed=0):
+    """Training examples/sec over synthetic shards through the tf.data pipeline (second epoch)."""
+    from train_chess_model import ThroughputLogger, make_dataset
+    model = build_reference_model(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        _synthetic_shards(tmp, random_boards(examples, seed=seed), seed)
+        data, count = make_dataset(tmp, batch_size, seed=seed)
+        logger = ThroughputLogger(count)
+        history = model.fit(data, epochs=2, callbacks=[logger], verbose=0)
+    # The first epoch includes tracing and pipeline warm-up
+    return {'examples_per_sec': float(history.history['examples_per_sec'][-1])}
+
+def _time_calls(fn, args_list):
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+def bench_inference(model, boards, batch_size=256, prefix=""):
+    """Forward-pass throughput, and MoveEngine.best_moves latency and throughput.
+
+    The engine runs with caching disabled, so its timings include board
+    encoding and legal-move masking.
+    """
+    from board_encoding import boards_to_tensor
+    from engine import MoveEngine
+    x = boards_to_tensor(boards[:batch_size])
+    np.asarray(model(x, training=False))
+    start = time.perf_counter()
+    for _ in range(10):
+        np.asarray(model(x, training=False))
+    forward = 10 * len(x) / (time.perf_counter() - start)
+    engine = MoveEngine(model=model, mapping_path=None, cache_size=0, max_batch=batch_size)
+    engine.best_moves(boards[:1])  # Warm up
+    single = _time_calls(lambda board: engine.best_moves([board]), boards[:200])
+    start = time.perf_counter()
+    for i in range(0, len(boards), batch_size):
+        engine.best_moves(boards[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    return {
+        f'{prefix}forward_positions_per_sec': forward,
+        f'{prefix}single_p50_ms': float(np.percentile(single, 50)),
+        f'{prefix}single_p95_ms': float(np.percentile(single, 95)),
+        f'{prefix}batch_positions_per_sec': len(boards) / elapsed,
+    }
+
+def bench_search(policy=None, positions=4, time_limit=1.0, seed=0):
+    """Alpha-beta nodes/sec (material only, and policy-ordered) and MCTS simulations/sec."""
+    from search import AlphaBetaSearch
+    boards = random_boards(positions, seed=seed, max_plies=20)
+    results = {}
+    engines = [('alphabeta_material', AlphaBetaSearch())]
+    if policy is not None:
+        engines.append(('alphabeta_policy', AlphaBetaSearch(policy=policy)))
+    for name, engine in engines:
+        nodes = elapsed = 0
+        for board in boards:
+            result = engine.search(board, time_limit=time_limit)
+            nodes += result.nodes
+            elapsed += result.elapsed
+        results[f'{name}_nodes_per_sec'] = nodes / elapsed
+    if policy is not None:
+        from mcts import MCTS
+        simulations = elapsed = 0
+        for board in boards:
+            result = MCTS(policy).search(board, time_limit=time_limit)
+            simulations += result.simulations
+            elapsed += result.elapsed
+        results['mcts_simulations_per_sec'] = simulations / elapsed
+    return results
+
+def _offscreen_gl_context(size=(800, 800)):
+    """Make an EGL pbuffer context current and stub out pygame's window calls."""
+    import ctypes
+
+    from OpenGL import EGL
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not EGL.eglInitialize(display, None, None):
+        raise RuntimeError("eglInitialize failed")
+    attrs = (EGL.EGLint * 13)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8,
+                              EGL.EGL_BLUE_SIZE, 8, EGL.EGL_ALPHA_SIZE, 8, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                              EGL.EGL_NONE)
+    config = EGL.EGLConfig()
+    count = EGL.EGLint()
+    if not EGL.eglChooseConfig(display, attrs, ctypes.pointer(config), 1, ctypes.pointer(count)) or not count.value:
+        raise RuntimeError("No EGL config with OpenGL pbuffer support")
+    surface_attrs = (EGL.EGLint * 5)(EGL.EGL_WIDTH, size[0], EGL.EGL_HEIGHT, size[1], EGL.EGL_NONE)
+    surface = EGL.eglCreatePbufferSurface(display, config, surface_attrs)
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise RuntimeError("eglMakeCurrent failed")
+
+    import pygame
+    pygame.display.set_mode = lambda *args, **kwargs: None
+    pygame.display.set_caption = lambda *args, **kwargs: None
+    pygame.display.flip = lambda: None
+
+def _render_worker(frames):
+    """Run in a fresh process: time ChessGame's draw calls, offscreen when there is no display."""
+    if not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")) and sys.platform.startswith("linux"):
+        # Must be set before OpenGL is first imported
+        os.environ["PYOPENGL_PLATFORM"] = "egl"
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        _offscreen_gl_context()
+    from chess_game import ChessGame
+    game = ChessGame()
+    game.player_color = chess.WHITE
+    stats = game.measure_frame_times(frames)
+    from OpenGL.GL import GL_RENDERER, glGetString
+    stats['renderer'] = glGetString(GL_RENDERER).decode()
+    return stats
+
+def bench_render(frames=300):
+    """ChessGame frame times; returns {'skipped': reason} when no GL context can be created."""
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            stats = executor.submit(_render_worker, frames).result()
+    except Exception as e:
+        return {'skipped': f"{type(e).__name__}: {e}"}
+    return {f'frame_{name}' if name.endswith('_ms') else name: value for name, value in stats.items()}
+
+def environment():
+    """Describe the machine and commit the results came from."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'chess': chess.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def run(selected=BENCHMARKS, workers=None, seed=0, search_time=1.0, render_frames=300):
+    """Run the selected benchmarks on synthetic inputs and return {'environment', 'results'}."""
+    results = {}
+
+    def record(name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            results[name] = fn(*args, **kwargs)
+        except ImportError as e:
+            results[name] = {'skipped': f"missing dependency: {e.name}"}
+        logging.info("%s (%.1fs): %s", name, time.perf_counter() - start, results[name])
+
+    if "parse" in selected:
+        with tempfile.TemporaryDirectory() as tmp:
+            pgn_path = write_synthetic_pgn(os.path.join(tmp, "synthetic.pgn"), seed=seed)
+            record("parse", bench_parse, pgn_path, workers=workers)
+    if "encode" in selected:
+        record("encode", bench_encode)
+    if "train" in selected:
+        record("train", bench_train, seed=seed)
+
+    policy = None
+    if "inference" in selected or "search" in selected:
+        try:
+            model = build_reference_model(seed)
+        except ImportError:
+            model = None
+        if model is not None:
+            from engine import MoveEngine
+            policy = MoveEngine(model=model, mapping_path=None)
+    if "inference" in selected:
+        if model is None:
+            results["inference"] = {'skipped': "missing dependency: tensorflow"}
+        else:
+            from engine import NumpyPolicyModel
+            from export_model import export_npz
+            boards = random_boards(4096, seed=seed + 1)
+            results["inference"] = bench_inference(model, boards, prefix="keras_")
+            with tempfile.TemporaryDirectory() as tmp:
+                npz = export_npz(model, os.path.join(tmp, "model.npz"), "int8")
+                results["inference"].update(bench_inference(NumpyPolicyModel(npz), boards, prefix="numpy_int8_"))
+            logging.info("inference: %s", results['inference'])
+    if "search" in selected:
+        logging.disable(logging.INFO)  # Silence the per-depth and per-search logs
+        try:
+            record("search", bench_search, policy, time_limit=search_time, seed=seed)
+        finally:
+            logging.disable(logging.NOTSET)
+        logging.info("search: %s", results['search'])
+    if "render" in selected:
+        record("render", bench_render, render_frames)
+    return {'environment': environment(), 'results': results}
+
+def higher_is_better(metric):
+    return metric.endswith("_per_sec")
+
+def compare(current, baseline, tolerance=0.1):
+    """Return [(benchmark, metric, baseline, current, change)] for metrics that got worse by more than tolerance."""
+    regressions = []
+    for name, metrics in current['results'].items():
+        old_metrics = baseline.get('results', {}).get(name, {})
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            if not (higher_is_better(metric) or metric.endswith("_ms")):
+                continue
+            change = value / old - 1.0
+            worse = -change if higher_is_better(metric) else change
+            if worse > tolerance:
+                regressions.append((name, metric, old, value, change))
+    return regressions
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark parsing, encoding, training, inference, search and "
+                                                 "rendering on synthetic inputs.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--out", default="benchmarks.json", help="Write results here as JSON")
+    parser.add_argument("--baseline", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown before flagging (0.1 = 10%%)")
+    parser.add_argument("--workers", type=int, default=None, help="Parse worker processes")
+    parser.add_argument("--search-time", type=float, default=1.0, help="Seconds per searched position")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    report = run(args.only, workers=args.workers, seed=args.seed, search_time=args.search_time)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for name, metric, old, new, change in regressions:
+            print(f"REGRESSION {name}.{metric}: {old:,.3f} -> {new:,.3f} ({change:+.1%})")
+        print(f"{len(regressions)} regressions against {args.baseline} (commit {baseline['environment'].get('commit')})")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,96 @@
+import time
+
+import chess
+import numpy as np
+
+# Plane order: white P, N, B, R, Q, K, then black P, N, B, R, Q, K
+PLANES = 12
+
+def board_masks(board):
+    """Return the 12 piece bitboards of a board in plane order."""
+    black, white = board.occupied_co  # Indexed by color, chess.BLACK == 0
+    pieces = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
+    return [p & white for p in pieces] + [p & black for p in pieces]
+
+def unpack_masks(masks):
+    """Unpack (..., 12) uint64 bitboards to (..., 12, 8, 8) uint8 planes indexed [rank, file]."""
+    # Bit i of a bitboard is square i = rank * 8 + file, so a little-endian
+    # byte view unpacked with little bit order lands squares in a1..h8 order.
+    bits = np.unpackbits(masks.astype('<u8').view(np.uint8), bitorder='little')
+    return bits.reshape(masks.shape + (8, 8))
+
+def board_to_tensor(board):
+    """Convert a chess board to a 12x8x8 tensor (6 piece types x 2 colors)."""
+    masks = np.array(board_masks(board), dtype=np.uint64)
+    return unpack_masks(masks).astype(np.float32)
+
+def boards_to_tensor(boards, out=None, dtype=np.float32):
+    """Encode N boards into an (N, 12, 8, 8) array, reusing out if given."""
+    masks = np.array([board_masks(board) for board in boards], dtype=np.uint64).reshape(-1, PLANES)
+    if out is None:
+        out = np.empty((len(masks), PLANES, 8, 8), dtype=dtype)
+    out = out[:len(masks)]
+    out[...] = unpack_masks(masks)
+    return out
+
+def board_to_tensor_loop(board):
+    """Reference per-square encoder, kept for benchmarking and verification."""
+    tensor = np.zeros((12, 8, 8), dtype=np.float32)
+    piece_map = {
+        chess.PAWN: 0, chess.KNIGHT: 1, chess.BISHOP: 2,
+        chess.ROOK: 3, chess.QUEEN: 4, chess.KING: 5
+    }
+
+    for square in chess.SQUARES:
+        piece = board.piece_at(square)
+        if piece:
+            color_idx = 0 if piece.color == chess.WHITE else 6
+            piece_idx = piece_map[piece.piece_type]
+            rank = chess.square_rank(square)
+            file = chess.square_file(square)
+            tensor[color_idx + piece_idx, rank, file] = 1.0
+
+    return tensor
+
+def random_boards(n, seed=0, max_plies=80):
+    """Generate n positions reached by random legal play."""
+    rng = np.random.default_rng(seed)
+    boards = []
+    board = chess.Board()
+    while len(boards) < n:
+        moves = list(board.legal_moves)
+        if not moves or board.ply() >= max_plies:
+            board = chess.Board()
+            continue
+        board.push(moves[rng.integers(len(moves))])
+        boards.append(board.copy(stack=False))
+    return boards
+
+def benchmark(n=20000, batch_size=1024):
+    """Compare positions/sec of the per-square loop and the bitboard encoders."""
+    boards = random_boards(n)
+    for board in boards[:200]:
+        assert np.array_equal(board_to_tensor(board), board_to_tensor_loop(board))
+
+    results = {}
+    start = time.perf_counter()
+    for board in boards:
+        board_to_tensor_loop(board)
+    results['loop'] = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for board in boards:
+        board_to_tensor(board)
+    results['bitboard'] = n / (time.perf_counter() - start)
+
+    out = np.empty((batch_size, PLANES, 8, 8), dtype=np.float32)
+    start = time.perf_counter()
+    for i in range(0, n, batch_size):
+        boards_to_tensor(boards[i:i + batch_size], out=out)
+    results['bitboard_batch'] = n / (time.perf_counter() - start)
+    return results
+
+if __name__ == "__main__":
+    results = benchmark()
+    for name, rate in results.items():
+        print(f"{name:>15}: {rate:12,.0f} positions/sec ({rate / results['loop']:.1f}x)")
@@ -8,16 +8,43 @@ import numpy as np
 import logging
 import asyncio
 import platform
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import STATS, profiled
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+# Posted from the executor when the AI's move is ready, so an idle loop blocked on events wakes up
+AI_MOVE_READY = pygame.USEREVENT + 1
+IDLE_WAIT_MS = 1000
+STATS_REFRESH_MS = 500  # How often the F3 stats overlay is redrawn while visible
+
+def choose_ai_move(ai, board, time_limit, book=None):
+    """Executor job: play from the opening book if possible, else ask the AI within its think-time budget."""
+    start = time.perf_counter()
+    move = book.choose_move(board) if book is not None else None
+    if move is None:
+        move = ai.best_move(board, time_limit=time_limit)
+    return move, time.perf_counter() - start
+
 class ChessGame:
-    def __init__(self):
-        """Initialize Pygame, OpenGL, and chess board."""
+    def __init__(self, ai=None, think_time=1.0, on_ai_move=None, executor=None, book=None):
+        """Initialize Pygame, OpenGL, and chess board.
+
+        If ai is given (any object with best_move(board, time_limit=...)), it
+        plays the color the human does not choose. Its moves are computed in
+        executor (a single worker thread by default; a process pool works if
+        ai is picklable) so rendering never blocks on inference, and
+        on_ai_move(move, elapsed) is called once each move is on the board.
+        While the position is in book (an opening_book.OpeningBook), the AI
+        plays book moves instead of searching.
+        """
         pygame.init()
         self.display = (800, 800)
-        pygame.display.set_mode(self.display, DOUBLEBUF | OPENGL)
+        pygame.display.set_mode(self.display, DOUBLEBUF | OPENGL | RESIZABLE)
         pygame.display.set_caption("2D Chess Game")
         
         # OpenGL setup
@@ -35,37 +62,109 @@ class ChessGame:
         self.selected_square = None
         self.legal_moves = []
         self.textures = self.load_textures()
+        self.board_list = self.build_board_list()
+        self.piece_key = None
+        self.highlight_key = None
+        self.overlay_textures = {}
+        self.dirty = True
+        self.frame_times = deque(maxlen=10000)
+        self.idle_cpu = 0.0
+        self.idle_wall = 0.0
+        self.show_stats = False
+        self.stats_texture = None
+        self.stats_size = (0, 0)
+        self.stats_rendered_at = 0.0
         self.font = pygame.font.SysFont("arial", 16)
         self.player_color = None  # Will be set in choose_color
-        logging.debug(f"Initial board: {self.board}")
+        self.ai = ai
+        self.think_time = think_time
+        self.on_ai_move = on_ai_move
+        self.book = book
+        self.executor = executor or (ThreadPoolExecutor(max_workers=1) if ai is not None else None)
+        self.ai_task = None
+        self.ai_error = None  # Set when the AI fails; the game then stops
+        logging.debug("Initial board:\n%s", self.board)
 
     def load_textures(self):
-        """Load chess piece PNGs as OpenGL textures."""
+        """Load chess piece PNGs into a single OpenGL texture atlas.
+
+        Returns {piece_key: (u0, v0, u1, v1)} texture coordinates within the
+        atlas; self.atlas_texture holds the atlas texture id.
+        """
         piece_files = {
             'wp': 'pieces/wp.png', 'wn': 'pieces/wn.png', 'wb': 'pieces/wb.png',
             'wr': 'pieces/wr.png', 'wq': 'pieces/wq.png', 'wk': 'pieces/wk.png',
             'bp': 'pieces/bp.png', 'bn': 'pieces/bn.png', 'bb': 'pieces/bb.png',
             'br': 'pieces/br.png', 'bq': 'pieces/bq.png', 'bk': 'pieces/bk.png'
         }
-        textures = {}
+        images = {}
         for piece, file in piece_files.items():
             try:
-                image = Image.open(file).convert('RGBA')
-                image_data = np.array(image)
-                width, height = image.size
-                texture_id = glGenTextures(1)
-                glBindTexture(GL_TEXTURE_2D, texture_id)
-                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-                glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, image_data)
-                textures[piece] = texture_id
-                logging.info(f"Loaded texture: {file}")
+                images[piece] = Image.open(file).convert('RGBA')
+                logging.info("Loaded texture: %s", file)
             except FileNotFoundError:
-                logging.error(f"Texture not found: {file}")
+                logging.error("Texture not found: %s", file)
             except Exception as e:
-                logging.error(f"Error loading {file}: {e}")
+                logging.error("Error loading %s: %s", file, e)
+
+        # Pack the 12 pieces into a 6x2 grid of equal cells; missing pieces become solid red cells
+        cell = max([max(image.size) for image in images.values()] + [1])
+        atlas = np.zeros((2 * cell, 6 * cell, 4), dtype=np.uint8)
+        textures = {}
+        for i, piece in enumerate(piece_files):
+            row, col = divmod(i, 6)
+            if piece in images:
+                image = images[piece].resize((cell, cell))
+                atlas[row * cell:(row + 1) * cell, col * cell:(col + 1) * cell] = np.array(image)
+            else:
+                atlas[row * cell:(row + 1) * cell, col * cell:(col + 1) * cell] = (255, 0, 0, 255)
+            textures[piece] = (col / 6, row / 2, (col + 1) / 6, (row + 1) / 2)
+
+        self.atlas_texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.atlas_texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 6 * cell, 2 * cell, 0, GL_RGBA, GL_UNSIGNED_BYTE, atlas)
+        STATS.incr('texture_uploads')
+        STATS.incr('texture_upload_bytes', atlas.nbytes)
+        glBindTexture(GL_TEXTURE_2D, 0)
         return textures
 
+    def build_board_list(self):
+        """Compile the static 8x8 board into a display list drawn with one call per frame."""
+        board_list = glGenLists(1)
+        glNewList(board_list, GL_COMPILE)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glBegin(GL_QUADS)
+        for display_row in range(8):
+            for col in range(8):
+                if (display_row + col) % 2 == 0:
+                    glColor3f(1.0, 1.0, 1.0)  # White
+                else:
+                    glColor3f(0.6, 0.3, 0.0)  # Brown
+                x = col * self.square_size
+                y = display_row * self.square_size
+                glVertex2f(x, y)
+                glVertex2f(x + self.square_size, y)
+                glVertex2f(x + self.square_size, y + self.square_size)
+                glVertex2f(x, y + self.square_size)
+        glEnd()
+        glEndList()
+        return board_list
+
+    def square_quads(self, squares, scale_factor=1.0):
+        """Return (len(squares) * 4, 2) float32 quad corners for squares in display coordinates."""
+        squares = np.asarray(squares, dtype=np.int64)
+        cols = squares % 8
+        rows = squares // 8
+        if self.player_color != chess.WHITE:
+            rows = 7 - rows  # Rank 8 at bottom for Black
+        size = self.square_size * scale_factor
+        offset = (1 - scale_factor) / 2 * self.square_size
+        x = (cols * self.square_size + offset)[:, np.newaxis] + np.array([0, size, size, 0])
+        y = (rows * self.square_size + offset)[:, np.newaxis] + np.array([0, 0, size, size])
+        return np.stack([x, y], axis=-1).reshape(-1, 2).astype(np.float32)
+
     def get_display_row(self, logical_row):
         """Map logical row to display row based on player color."""
         if self.player_color == chess.WHITE:
@@ -76,20 +175,20 @@ class ChessGame:
     def choose_color(self):
         """Menu to choose player color."""
         menu_running = True
-        # Define button rectangles
-        button_width, button_height = 300, 60
-        white_button_rect = pygame.Rect(250, 300, button_width, button_height)
-        black_button_rect = pygame.Rect(250, 400, button_width, button_height)
         font = pygame.font.SysFont("arial", 24)  # Larger font for clarity
         
         while menu_running:
+            white_button_rect, black_button_rect = self.menu_buttons()
             for event in pygame.event.get():
                 if event.type == QUIT:
                     pygame.quit()
                     exit()
+                elif event.type == VIDEORESIZE:
+                    self.resize(event.size)
+                    white_button_rect, black_button_rect = self.menu_buttons()
                 elif event.type == MOUSEBUTTONDOWN:
                     x, y = event.pos
-                    logging.info(f"Menu click at (x={x}, y={y})")
+                    logging.info("Menu click at (x=%s, y=%s)", x, y)
                     if white_button_rect.collidepoint(x, y):
                         self.player_color = chess.WHITE
                         menu_running = False
@@ -99,93 +198,145 @@ class ChessGame:
                         menu_running = False
                         logging.info("Selected color: Black")
             
-            # Draw menu
-            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-            menu_surface = pygame.Surface(self.display, pygame.SRCALPHA)
-            
-            # Background
-            menu_surface.fill((200, 200, 200))  # Light gray
-            
-            # Debug markers (colored squares at corners)
-            pygame.draw.rect(menu_surface, (255, 0, 0), (0, 0, 20, 20))  # Top-left: Red
-            pygame.draw.rect(menu_surface, (0, 255, 0), (780, 0, 20, 20))  # Top-right: Green
-            pygame.draw.rect(menu_surface, (0, 0, 255), (0, 780, 20, 20))  # Bottom-left: Blue
-            
-            # Title
-            title = font.render("Choose Your Color", True, (0, 0, 0))
-            title_rect = title.get_rect(center=(400, 200))
-            menu_surface.blit(title, title_rect)
+            if not menu_running:
+                break
             
-            # Buttons
-            pygame.draw.rect(menu_surface, (255, 255, 255), white_button_rect)  # White button
-            pygame.draw.rect(menu_surface, (50, 50, 50), black_button_rect)     # Dark gray button
-            white_text = font.render("Play as White", True, (0, 0, 0))
-            black_text = font.render("Play as Black", True, (255, 255, 255))   # White text for contrast
-            white_text_rect = white_text.get_rect(center=white_button_rect.center)
-            black_text_rect = black_text.get_rect(center=black_button_rect.center)
-            menu_surface.blit(white_text, white_text_rect)
-            menu_surface.blit(black_text, black_text_rect)
+            # Draw menu from its cached overlay texture
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            self.draw_overlay(self.overlay_texture(
+                'menu', lambda: self.render_menu(white_button_rect, black_button_rect, font)))
             
+            pygame.display.flip()
+            pygame.time.wait(10)
+        
+        # The menu is never shown again; free its texture
+        self.invalidate_overlays()
+
+    def menu_buttons(self):
+        """Return the White and Black button rectangles, centred for the current window size."""
+        width, height = self.display
+        button_width, button_height = 300, 60
+        left = (width - button_width) // 2
+        white_button_rect = pygame.Rect(left, height * 3 // 8, button_width, button_height)
+        black_button_rect = pygame.Rect(left, white_button_rect.bottom + 40, button_width, button_height)
+        return white_button_rect, black_button_rect
+
+    def render_menu(self, white_button_rect, black_button_rect, font):
+        """Render the color selection menu to a Pygame surface."""
+        width, height = self.display
+        menu_surface = pygame.Surface(self.display, pygame.SRCALPHA)
+        
+        # Background
+        menu_surface.fill((200, 200, 200))  # Light gray
+        
+        # Debug markers (colored squares at corners)
+        pygame.draw.rect(menu_surface, (255, 0, 0), (0, 0, 20, 20))  # Top-left: Red
+        pygame.draw.rect(menu_surface, (0, 255, 0), (width - 20, 0, 20, 20))  # Top-right: Green
+        pygame.draw.rect(menu_surface, (0, 0, 255), (0, height - 20, 20, 20))  # Bottom-left: Blue
+        
+        # Title
+        title = font.render("Choose Your Color", True, (0, 0, 0))
+        title_rect = title.get_rect(center=(width // 2, height // 4))
+        menu_surface.blit(title, title_rect)
+        
+        # Buttons
+        pygame.draw.rect(menu_surface, (255, 255, 255), white_button_rect)  # White button
+        pygame.draw.rect(menu_surface, (50, 50, 50), black_button_rect)     # Dark gray button
+        white_text = font.render("Play as White", True, (0, 0, 0))
+        black_text = font.render("Play as Black", True, (255, 255, 255))   # White text for contrast
+        white_text_rect = white_text.get_rect(center=white_button_rect.center)
+        black_text_rect = black_text.get_rect(center=black_button_rect.center)
+        menu_surface.blit(white_text, white_text_rect)
+        menu_surface.blit(black_text, black_text_rect)
+        return menu_surface
+
+    def overlay_texture(self, name, render):
+        """Return the cached texture for an overlay, uploading render()'s surface on a cache miss.
+
+        Overlays are keyed by name, player color and window size, so they are
+        uploaded once per orientation/size rather than once per frame.
+        """
+        key = (name, self.player_color, self.display)
+        texture_id = self.overlay_textures.get(key)
+        if texture_id is None:
+            surface = render()
             # Convert to OpenGL texture (no flip in Pygame)
-            menu_data = pygame.image.tostring(menu_surface, 'RGBA', False)
+            data = pygame.image.tostring(surface, 'RGBA', False)
             texture_id = glGenTextures(1)
             glBindTexture(GL_TEXTURE_2D, texture_id)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 800, 800, 0, GL_RGBA, GL_UNSIGNED_BYTE, menu_data)
-            
-            # Draw texture with corrected orientation
-            glBegin(GL_QUADS)
-            glTexCoord2f(0, 1); glVertex2f(0, 0)  # Bottom-left: texture top-left to screen bottom-left
-            glTexCoord2f(1, 1); glVertex2f(1, 0)  # Bottom-right: texture top-right to screen bottom-right
-            glTexCoord2f(1, 0); glVertex2f(1, 1)  # Top-right: texture bottom-right to screen top-right
-            glTexCoord2f(0, 0); glVertex2f(0, 1)  # Top-left: texture bottom-left to screen top-left
-            glEnd()
-            glDeleteTextures(1, [texture_id])
-            
-            pygame.display.flip()
-            pygame.time.wait(10)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, surface.get_width(), surface.get_height(), 0,
+                         GL_RGBA, GL_UNSIGNED_BYTE, data)
+            STATS.incr('texture_uploads')
+            STATS.incr('texture_upload_bytes', len(data))
+            self.overlay_textures[key] = texture_id
+            logging.info("Built %s overlay for %sx%s", name, *self.display)
+        return texture_id
 
-    def draw_square(self, col, row, color):
-        """Draw a single square with the specified color."""
-        glBindTexture(GL_TEXTURE_2D, 0)
-        glColor3f(*color)
-        x = col * self.square_size
-        y = row * self.square_size
+    def resize(self, size):
+        """Resize the window and viewport; overlays are rebuilt at the new size on next use."""
+        self.display = size
+        # pygame 2 keeps the existing OpenGL context, so textures and display lists survive
+        pygame.display.set_mode(self.display, DOUBLEBUF | OPENGL | RESIZABLE)
+        glViewport(0, 0, *self.display)
+        self.invalidate_overlays()
+        self.invalidate()
+
+    def invalidate_overlays(self):
+        """Free all cached overlay textures so they are rebuilt on next use."""
+        if self.overlay_textures:
+            glDeleteTextures(len(self.overlay_textures), list(self.overlay_textures.values()))
+        self.overlay_textures = {}
+
+    def draw_overlay(self, texture_id, x0=0.0, y0=0.0, x1=1.0, y1=1.0):
+        """Draw an overlay texture over the given window rectangle (the full window by default)."""
+        glColor3f(1.0, 1.0, 1.0)
+        glBindTexture(GL_TEXTURE_2D, texture_id)
+        # Draw texture with corrected orientation
         glBegin(GL_QUADS)
-        glVertex2f(x, y)
-        glVertex2f(x + self.square_size, y)
-        glVertex2f(x + self.square_size, y + self.square_size)
-        glVertex2f(x, y + self.square_size)
+        glTexCoord2f(0, 1); glVertex2f(x0, y0)  # Bottom-left: texture top-left to screen bottom-left
+        glTexCoord2f(1, 1); glVertex2f(x1, y0)  # Bottom-right: texture top-right to screen bottom-right
+        glTexCoord2f(1, 0); glVertex2f(x1, y1)  # Top-right: texture bottom-right to screen top-right
+        glTexCoord2f(0, 0); glVertex2f(x0, y1)  # Top-left: texture bottom-left to screen top-left
         glEnd()
+        glBindTexture(GL_TEXTURE_2D, 0)
+        STATS.incr('draw_calls')
 
     def draw_chessboard(self):
         """Draw 8x8 chessboard with alternating colors."""
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        for display_row in range(8):
-            for col in range(8):
-                if (display_row + col) % 2 == 0:
-                    color = (1.0, 1.0, 1.0)  # White
-                else:
-                    color = (0.6, 0.3, 0.0)  # Brown
-                self.draw_square(col, display_row, color)
-        glBindTexture(GL_TEXTURE_2D, 0)
+        glCallList(self.board_list)
+        STATS.incr('draw_calls')
 
     def draw_highlights(self):
         """Highlight selected square and legal moves."""
-        if self.selected_square is not None:
-            col = chess.square_file(self.selected_square)
-            logical_row = chess.square_rank(self.selected_square)
-            display_row = self.get_display_row(logical_row)
-            self.draw_square(col, display_row, (1.0, 1.0, 0.0))  # Yellow
-        for move in self.legal_moves:
-            col = chess.square_file(move.to_square)
-            logical_row = chess.square_rank(move.to_square)
-            display_row = self.get_display_row(logical_row)
-            self.draw_square(col, display_row, (0.0, 1.0, 0.0))  # Green
+        key = (self.selected_square, tuple(self.legal_moves), self.player_color)
+        if key != self.highlight_key:
+            squares = [move.to_square for move in self.legal_moves]
+            colors = [(0.0, 1.0, 0.0)] * len(squares)  # Green
+            if self.selected_square is not None:
+                squares.insert(0, self.selected_square)
+                colors.insert(0, (1.0, 1.0, 0.0))  # Yellow
+            self.highlight_vertices = self.square_quads(squares)
+            self.highlight_colors = np.repeat(np.array(colors, dtype=np.float32).reshape(-1, 3), 4, axis=0)
+            self.highlight_key = key
+        if not len(self.highlight_vertices):
+            return
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, self.highlight_vertices)
+        glColorPointer(3, GL_FLOAT, 0, self.highlight_colors)
+        glDrawArrays(GL_QUADS, 0, len(self.highlight_vertices))
+        STATS.incr('draw_calls')
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
 
-    def draw_labels(self):
-        """Draw a-h and 1-8 labels using Pygame."""
+    def render_labels(self):
+        """Render a-h and 1-8 labels to a Pygame surface."""
+        width, height = self.display
+        square_width, square_height = width / 8, height / 8
         label_surface = pygame.Surface(self.display, pygame.SRCALPHA)
         files = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
         if self.player_color == chess.WHITE:
@@ -198,83 +349,117 @@ class ChessGame:
         
         # Draw file labels (a-h)
         for col, file in enumerate(display_files):
-            x = col * 100 + 50
+            x = col * square_width + square_width / 2
             text = self.font.render(file, True, (0, 0, 0))
-            text_rect = text.get_rect(center=(x, 785))  # Bottom
+            text_rect = text.get_rect(center=(x, height - 15))  # Bottom
             label_surface.blit(text, text_rect)
             text_rect = text.get_rect(center=(x, 5))    # Top
             label_surface.blit(text, text_rect)
-            logging.debug(f"File {file} at x={x}")
+            logging.debug("File %s at x=%s", file, x)
         
         # Draw rank labels (1-8)
         for display_row in range(8):
             rank_label = ranks[display_row]
-            y = display_row * 100 + 50
+            y = display_row * square_height + square_height / 2
             text = self.font.render(rank_label, True, (0, 0, 0))
             text_rect = text.get_rect(center=(5, y))    # Left
             label_surface.blit(text, text_rect)
-            text_rect = text.get_rect(center=(785, y))  # Right
+            text_rect = text.get_rect(center=(width - 15, y))  # Right
             label_surface.blit(text, text_rect)
-            logging.debug(f"Rank {rank_label} at y={y}")
-        
-        # Convert to OpenGL texture (no vertical flip)
-        label_data = pygame.image.tostring(label_surface, 'RGBA', False)
-        texture_id = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, texture_id)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 800, 800, 0, GL_RGBA, GL_UNSIGNED_BYTE, label_data)
-        
-        # Draw texture with corrected orientation
-        glBegin(GL_QUADS)
-        glTexCoord2f(0, 1); glVertex2f(0, 0)  # Bottom-left: texture top-left to screen bottom-left
-        glTexCoord2f(1, 1); glVertex2f(1, 0)  # Bottom-right: texture top-right to screen bottom-right
-        glTexCoord2f(1, 0); glVertex2f(1, 1)  # Top-right: texture bottom-right to screen top-right
-        glTexCoord2f(0, 0); glVertex2f(0, 1)  # Top-left: texture bottom-left to screen top-left
-        glEnd()
-        glDeleteTextures(1, [texture_id])
+            logging.debug("Rank %s at y=%s", rank_label, y)
+        return label_surface
 
-    def draw_pieces(self):
-        """Draw chess pieces using textures."""
+    def draw_labels(self):
+        """Draw a-h and 1-8 labels from the cached overlay texture."""
+        self.draw_overlay(self.overlay_texture('labels', self.render_labels))
+
+    def render_ai_error(self):
+        """Render a banner explaining that the game stopped because the AI failed."""
+        surface = pygame.Surface(self.display, pygame.SRCALPHA)
+        width, height = self.display
+        pygame.draw.rect(surface, (0, 0, 0, 190), (0, height // 2 - 40, width, 80))
+        for text, y in ((self.ai_error, height // 2 - 12), ("Game stopped", height // 2 + 14)):
+            rendered = self.font.render(text, True, (255, 255, 255))
+            surface.blit(rendered, rendered.get_rect(center=(width // 2, y)))
+        return surface
+
+    def render_stats(self):
+        """Render the F3 stats panel to a Pygame surface."""
+        lines = []
+        frame = STATS.timer_summary('frame')
+        if frame is not None:
+            lines.append(f"frame p50 {frame['p50_ms']:.1f} ms  p95 {frame['p95_ms']:.1f} ms  ({frame['count']} drawn)")
+        lines.append(f"draw calls/frame {STATS.gauges.get('draw_calls_per_frame', 0)}")
+        lines.append(f"texture uploads {STATS.counters['texture_uploads']} "
+                     f"({STATS.counters['texture_upload_bytes'] / 2**20:.1f} MB)")
+        idle = self.frame_stats()['idle_cpu_percent']
+        lines.append(f"idle CPU {idle:.1f}%")
+        inference = STATS.timer_summary('inference')
+        if inference is not None:
+            lines.append(f"inference p50 {inference['p50_ms']:.1f} ms  ({inference['count']} batches)")
+        if STATS.counters['engine_cache_hits'] + STATS.counters['engine_cache_misses']:
+            lines.append(f"policy cache hit rate {STATS.ratio('engine_cache_hits', 'engine_cache_misses'):.0%}")
+        if STATS.counters['book_hits']:
+            lines.append(f"book moves {STATS.counters['book_hits']}")
+        texts = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        surface = pygame.Surface((max(text.get_width() for text in texts) + 12, 20 * len(texts) + 8), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 170))
+        for i, text in enumerate(texts):
+            surface.blit(text, (6, 4 + 20 * i))
+        return surface
+
+    def draw_stats(self):
+        """Draw the stats panel in the top-left corner, re-uploading it at most every STATS_REFRESH_MS."""
+        now = time.perf_counter()
+        if self.stats_texture is None or (now - self.stats_rendered_at) * 1000 >= STATS_REFRESH_MS:
+            surface = self.render_stats()
+            data = pygame.image.tostring(surface, 'RGBA', False)
+            if self.stats_texture is None:
+                self.stats_texture = glGenTextures(1)
+            glBindTexture(GL_TEXTURE_2D, self.stats_texture)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, surface.get_width(), surface.get_height(), 0,
+                         GL_RGBA, GL_UNSIGNED_BYTE, data)
+            STATS.incr('texture_uploads')
+            STATS.incr('texture_upload_bytes', len(data))
+            self.stats_size = surface.get_size()
+            self.stats_rendered_at = now
+        width, height = self.stats_size[0] / self.display[0], self.stats_size[1] / self.display[1]
+        self.draw_overlay(self.stats_texture, 0.01, 0.99 - height, 0.01 + width, 0.99)
+
+    def update_piece_arrays(self):
+        """Rebuild piece vertex/texcoord arrays; called only when the position or orientation changes."""
         piece_map = {
             'P': 'wp', 'N': 'wn', 'B': 'wb', 'R': 'wr', 'Q': 'wq', 'K': 'wk',
             'p': 'bp', 'n': 'bn', 'b': 'bb', 'r': 'br', 'q': 'bq', 'k': 'bk'
         }
-        scale_factor = 0.8
-        offset = (1 - scale_factor) / 2 * self.square_size
-        
-        for square in chess.SQUARES:
-            piece = self.board.piece_at(square)
-            if piece:
-                piece_key = piece_map[piece.symbol()]
-                col = chess.square_file(square)
-                logical_row = chess.square_rank(square)
-                display_row = self.get_display_row(logical_row)
-                x = col * self.square_size + offset
-                y = display_row * self.square_size + offset
-                piece_size = self.square_size * scale_factor
-                
-                glColor3f(1.0, 1.0, 1.0)  # No tint
-                if piece_key in self.textures:
-                    glBindTexture(GL_TEXTURE_2D, self.textures[piece_key])
-                    logging.debug(f"Rendering texture {piece_key} at {chess.square_name(square)}")
-                else:
-                    logging.warning(f"Texture {piece_key} not found, using fallback")
-                    glBindTexture(GL_TEXTURE_2D, 0)
-                    glColor3f(1.0, 0.0, 0.0 if piece.color == chess.WHITE else 0.0)  # Red/white, black/black
-                
-                glBegin(GL_QUADS)
-                if piece_key in self.textures:
-                    glTexCoord2f(0, 1); glVertex2f(x, y)
-                    glTexCoord2f(1, 1); glVertex2f(x + piece_size, y)
-                    glTexCoord2f(1, 0); glVertex2f(x + piece_size, y + piece_size)
-                    glTexCoord2f(0, 0); glVertex2f(x, y + piece_size)
-                else:
-                    glVertex2f(x, y)
-                    glVertex2f(x + piece_size, y)
-                    glVertex2f(x + piece_size, y + piece_size)
-                    glVertex2f(x, y + piece_size)
-                glEnd()
+        pieces = self.board.piece_map()
+        self.piece_vertices = self.square_quads(list(pieces), scale_factor=0.8)
+        # Texture rows run top-down, so the bottom-left corner samples (u0, v1)
+        texcoords = [self.textures[piece_map[piece.symbol()]] for piece in pieces.values()]
+        self.piece_texcoords = np.array(
+            [[(u0, v1), (u1, v1), (u1, v0), (u0, v0)] for u0, v0, u1, v1 in texcoords], dtype=np.float32
+        ).reshape(-1, 2)
+        self.piece_key = (self.board.board_fen(), self.player_color)
+
+    def draw_pieces(self):
+        """Draw all chess pieces from the texture atlas in one batched call."""
+        if self.piece_key != (self.board.board_fen(), self.player_color):
+            self.update_piece_arrays()
+        if not len(self.piece_vertices):
+            return
+        glColor3f(1.0, 1.0, 1.0)  # No tint
+        glBindTexture(GL_TEXTURE_2D, self.atlas_texture)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, self.piece_vertices)
+        glTexCoordPointer(2, GL_FLOAT, 0, self.piece_texcoords)
+        glDrawArrays(GL_QUADS, 0, len(self.piece_vertices))
+        STATS.incr('draw_calls')
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindTexture(GL_TEXTURE_2D, 0)
 
     def get_square_from_mouse(self, pos):
         """Convert mouse position to chess square."""
@@ -286,51 +471,197 @@ class ChessGame:
             logical_row = int((y / self.display[1]) * 8)      # Bottom (y=800) -> rank 8
         if 0 <= col < 8 and 0 <= logical_row < 8:
             square = chess.square(col, logical_row)
-            logging.info(f"Clicked square: {chess.square_name(square)} at pixel (x={x}, y={y})")
+            logging.info("Clicked square: %s at pixel (x=%s, y=%s)", chess.square_name(square), x, y)
             return square
         logging.warning("Clicked outside board")
         return None
 
+    def start_ai_move(self):
+        """Start computing the AI's reply in the executor without blocking the loop."""
+        if self.ai is None or self.ai_task is not None or self.board.is_game_over():
+            return
+        self.ai_task = self.executor.submit(choose_ai_move, self.ai, self.board.copy(), self.think_time,
+                                            self.book)
+        self.ai_task.add_done_callback(self._post_ai_move_ready)
+        logging.info("AI thinking...")
+
+    @staticmethod
+    def _post_ai_move_ready(_task):
+        """Wake the game loop; runs on an executor thread, where pygame.event.post is safe.
+
+        Closing the window quits pygame without waiting for a search in
+        flight, so a late callback must not post into a shut-down pygame.
+        """
+        if not pygame.get_init():
+            return
+        try:
+            pygame.event.post(pygame.event.Event(AI_MOVE_READY))
+        except pygame.error:
+            pass  # pygame quit between the check and the post
+
+    def finish_ai_move(self):
+        """Apply the AI's move once the executor has produced it."""
+        task, self.ai_task = self.ai_task, None
+        try:
+            move, elapsed = task.result()
+        except Exception as e:
+            self.stop_on_ai_error(f"AI failed to choose a move: {e}")
+            return
+        if move is None or move not in self.board.legal_moves:
+            self.stop_on_ai_error(f"AI returned an illegal move: {move}")
+            return
+        if self.think_time is not None and elapsed > self.think_time * 1.5:
+            logging.warning("AI took %.2fs, over its %.2fs budget", elapsed, self.think_time)
+        self.board.push(move)
+        self.invalidate()
+        logging.info("AI moved %s in %.2fs", move, elapsed)
+        if self.on_ai_move is not None:
+            self.on_ai_move(move, elapsed)
+
+    def stop_on_ai_error(self, message):
+        """Stop the game when the AI cannot move, rather than leaving its pieces to the human."""
+        self.ai_error = message
+        logging.error("%s; stopping the game", message)
+        pygame.display.set_caption(f"2D Chess Game - {message}")
+        self.invalidate()
+
+    def invalidate(self):
+        """Mark the scene as changed so the next loop iteration redraws it."""
+        self.dirty = True
+
+    def render_frame(self):
+        """Draw and flip one frame, recording how long it took."""
+        start = time.perf_counter()
+        draw_calls = STATS.counters['draw_calls']
+        self.draw_chessboard()
+        self.draw_highlights()
+        self.draw_pieces()
+        self.draw_labels()
+        if self.ai_error is not None:
+            self.draw_overlay(self.overlay_texture('ai_error', self.render_ai_error))
+        if self.show_stats:
+            self.draw_stats()
+        pygame.display.flip()
+        elapsed = time.perf_counter() - start
+        self.frame_times.append(elapsed * 1000)
+        STATS.record('frame', elapsed)
+        STATS.gauge('draw_calls_per_frame', STATS.counters['draw_calls'] - draw_calls)
+        self.dirty = False
+
+    def frame_stats(self):
+        """Return frame-time percentiles (ms) and the CPU usage measured while blocked waiting for events."""
+        stats = {'frames': len(self.frame_times), 'idle_seconds': self.idle_wall,
+                 'idle_cpu_percent': 100.0 * self.idle_cpu / self.idle_wall if self.idle_wall else 0.0}
+        if self.frame_times:
+            times = np.array(self.frame_times)
+            stats.update({'mean_ms': float(times.mean()), 'p50_ms': float(np.percentile(times, 50)),
+                          'p95_ms': float(np.percentile(times, 95)), 'p99_ms': float(np.percentile(times, 99)),
+                          'max_ms': float(times.max())})
+        return stats
+
     async def game_loop(self):
-        """Main game loop for Pyodide compatibility."""
+        """Main game loop for Pyodide compatibility.
+
+        Frames are only drawn when something has marked the scene dirty.
+        While nothing is dirty the loop blocks on pygame events instead of
+        polling, except under Emscripten where it must keep yielding.
+        F3 toggles the stats overlay, which keeps refreshing while shown.
+        """
         self.choose_color()
         FPS = 60
+        blocking = platform.system() != "Emscripten"
+        self.invalidate()
+        if self.ai is not None and self.board.turn != self.player_color:
+            self.start_ai_move()
         while True:
-            for event in pygame.event.get():
+            if self.ai_task is not None and self.ai_task.done():
+                self.finish_ai_move()
+            if self.show_stats and (time.perf_counter() - self.stats_rendered_at) * 1000 >= STATS_REFRESH_MS:
+                self.invalidate()
+            if blocking and not self.dirty:
+                cpu_start, wall_start = time.process_time(), time.perf_counter()
+                timeout = STATS_REFRESH_MS if self.show_stats else IDLE_WAIT_MS
+                events = [pygame.event.wait(timeout)] + pygame.event.get()
+                self.idle_cpu += time.process_time() - cpu_start
+                self.idle_wall += time.perf_counter() - wall_start
+            else:
+                events = pygame.event.get()
+            for event in events:
                 if event.type == QUIT:
+                    if self.executor is not None:
+                        self.executor.shutdown(wait=False, cancel_futures=True)
+                    logging.info("Frame stats: %s", self.frame_stats())
                     pygame.quit()
                     return
+                elif event.type == VIDEORESIZE:
+                    self.resize(event.size)
+                elif event.type == VIDEOEXPOSE:
+                    self.invalidate()
+                elif event.type == KEYDOWN and event.key == K_F3:
+                    self.show_stats = not self.show_stats
+                    self.invalidate()
+                elif event.type == MOUSEBUTTONDOWN and self.ai_task is not None:
+                    logging.info("Ignoring click while the AI is thinking")
+                elif event.type == MOUSEBUTTONDOWN and self.ai_error is not None:
+                    logging.info("Ignoring click, the game stopped: %s", self.ai_error)
                 elif event.type == MOUSEBUTTONDOWN:
                     square = self.get_square_from_mouse(event.pos)
                     if square is not None:
                         piece = self.board.piece_at(square)
                         current_turn = "White" if self.board.turn else "Black"
-                        logging.info(f"Current turn: {current_turn}")
+                        logging.info("Current turn: %s", current_turn)
                         if self.selected_square is None:
-                            if piece and piece.color == self.board.turn:
+                            # Against the AI, only the human's own pieces can be picked up
+                            if piece and piece.color == self.board.turn and \
+                                    (self.ai is None or piece.color == self.player_color):
                                 self.selected_square = square
                                 self.legal_moves = [move for move in self.board.legal_moves if move.from_square == square]
-                                logging.info(f"Selected {piece.symbol()} at {chess.square_name(square)}, legal moves: {[str(m) for m in self.legal_moves]}")
+                                self.invalidate()
+                                if logging.getLogger().isEnabledFor(logging.INFO):
+                                    logging.info("Selected %s at %s, legal moves: %s", piece.symbol(),
+                                                 chess.square_name(square), [str(m) for m in self.legal_moves])
                             else:
-                                logging.warning(f"Invalid selection at {chess.square_name(square)}: No piece or wrong turn")
+                                logging.warning("Invalid selection at %s: No piece or wrong turn", chess.square_name(square))
                         else:
                             move = next((m for m in self.legal_moves if m.to_square == square), None)
                             if move:
                                 self.board.push(move)
-                                logging.info(f"Moved {move.uci()} ({chess.square_name(move.from_square)} to {chess.square_name(move.to_square)})")
+                                logging.info("Moved %s (%s to %s)", move.uci(), chess.square_name(move.from_square),
+                                             chess.square_name(move.to_square))
                                 self.selected_square = None
                                 self.legal_moves = []
+                                self.start_ai_move()
                             else:
-                                logging.warning(f"Invalid move to {chess.square_name(square)}")
+                                logging.warning("Invalid move to %s", chess.square_name(square))
                                 self.selected_square = None
                                 self.legal_moves = []
+                            self.invalidate()
             
+            if self.dirty:
+                self.render_frame()
+                await asyncio.sleep(1.0 / FPS)  # Cap redraws at FPS
+            else:
+                await asyncio.sleep(0 if blocking else 1.0 / FPS)
+
+    def measure_frame_times(self, frames=300):
+        """Render frames back to back and return frame-time statistics in milliseconds."""
+        times = []
+        for _ in range(frames):
+            start = time.perf_counter()
             self.draw_chessboard()
             self.draw_highlights()
             self.draw_pieces()
             self.draw_labels()
-            pygame.display.flip()
-            await asyncio.sleep(1.0 / FPS)
+            glFinish()
+            times.append((time.perf_counter() - start) * 1000)
+        times = np.array(times)
+        return {
+            'frames': frames,
+            'mean_ms': float(times.mean()),
+            'p50_ms': float(np.percentile(times, 50)),
+            'p95_ms': float(np.percentile(times, 95)),
+            'max_ms': float(times.max()),
+        }
 
     def run(self):
         """Start the game."""
@@ -340,5 +671,42 @@ class ChessGame:
             asyncio.run(self.game_loop())
 
 if __name__ == "__main__":
-    game = ChessGame()
-    game.run()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Play chess in a PyOpenGL window.")
+    parser.add_argument("--ai", action="store_true", help="Play against the trained model")
+    parser.add_argument("--model", default="data/chess_model.h5")
+    parser.add_argument("--mapping", default="data/idx_to_move.json")
+    parser.add_argument("--think-time", type=float, default=1.0, help="AI think-time budget in seconds")
+    parser.add_argument("--benchmark-frames", type=int, default=0,
+                        help="Render this many frames as White, print frame-time stats and exit")
+    parser.add_argument("--profile", default=None, help="Profile the session and write the result to this path")
+    parser.add_argument("--profile-mode", choices=["cprofile", "sample"], default="sample",
+                        help="cProfile (exact, slows rendering) or a low-overhead stack sampler")
+    parser.add_argument("--book", default=None, help="Polyglot opening book (see opening_book.py)")
+    parser.add_argument("--engine", choices=["policy", "alphabeta", "mcts"], default="policy",
+                        help="Raw policy network, alpha-beta search or MCTS")
+    args = parser.parse_args()
+
+    ai = None
+    if args.ai:
+        from engine import MoveEngine
+        ai = MoveEngine(args.model, args.mapping)
+        if args.engine == "alphabeta":
+            from search import AlphaBetaSearch
+            ai = AlphaBetaSearch(policy=ai)
+        elif args.engine == "mcts":
+            from mcts import MCTS
+            ai = MCTS(policy=ai)
+    book = None
+    if args.book:
+        from opening_book import OpeningBook
+        book = OpeningBook(args.book)
+    game = ChessGame(ai=ai, think_time=args.think_time, book=book)
+    if args.benchmark_frames:
+        game.player_color = chess.WHITE
+        print(game.measure_frame_times(args.benchmark_frames))
+        pygame.quit()
+    else:
+        with profiled(args.profile, args.profile_mode):
+            game.run()
\ No newline at end of file
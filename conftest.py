@@ -0,0 +1,2 @@
+# test_chess_ai.py is a manual smoke script that needs a trained model in data/
+collect_ignore = ["test_chess_ai.py"]
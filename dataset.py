@@ -0,0 +1,177 @@
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+PLANE_SHAPE = (12, 8, 8)
+PACKED_BYTES = int(np.prod(PLANE_SHAPE)) // 8  # 96 bytes per position vs 3072 as float32
+MANIFEST = "manifest.json"
+
+def pack_planes(planes):
+    """Bit-pack (N, 12, 8, 8) one-hot planes into (N, 96) uint8."""
+    planes = np.asarray(planes).reshape(len(planes), -1)
+    return np.packbits(planes.astype(bool), axis=1, bitorder='little')
+
+def pack_masks(masks):
+    """Bit-pack (N, 12) uint64 bitboards straight to (N, 96) uint8, skipping the one-hot planes.
+
+    Equal to pack_planes(unpack_masks(masks)): the little-endian bytes of
+    the bitboards already hold the squares in packbits-little order.
+    """
+    return np.ascontiguousarray(np.asarray(masks, dtype='<u8')).view(np.uint8).reshape(-1, PACKED_BYTES)
+
+def unpack_planes(packed, dtype=np.float32):
+    """Inverse of pack_planes: (N, 96) uint8 to (N, 12, 8, 8)."""
+    bits = np.unpackbits(np.asarray(packed), axis=1, bitorder='little')
+    return bits.reshape((len(packed),) + PLANE_SHAPE).astype(dtype, copy=False)
+
+class ShardWriter:
+    """Write positions into fixed-size .npy shards described by a JSON manifest.
+
+    Each shard stores bit-packed planes and int32 labels, plus any optional
+    per-position metadata arrays (e.g. game_id, ply, elo, or a sample weight)
+    passed to add(). Several writers can share out_dir if each has its own
+    prefix and manifest name; merge_manifests then joins them.
+    """
+
+    def __init__(self, out_dir, shard_size=1 << 20, prefix="shard", attrs=None, manifest=MANIFEST):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.attrs = dict(attrs or {})
+        self.manifest = manifest
+        self.shards = []
+        self.fields = None
+        self._buffer = {}
+        self._buffered = 0
+        os.makedirs(out_dir, exist_ok=True)
+
+    def add(self, planes, labels, packed=False, **meta):
+        """Append a batch of positions; shards are flushed as they fill up.
+
+        Pass packed=True when planes are already bit-packed by pack_planes.
+        """
+        planes = np.asarray(planes, dtype=np.uint8) if packed else pack_planes(planes)
+        columns = {"planes": planes, "labels": np.asarray(labels, dtype=np.int32)}
+        columns.update({name: np.asarray(values) for name, values in meta.items()})
+        if self.fields is None:
+            self.fields = {name: [str(col.dtype), list(col.shape[1:])] for name, col in columns.items()}
+        elif set(columns) != set(self.fields):
+            raise ValueError(f"Expected fields {sorted(self.fields)}, got {sorted(columns)}")
+
+        count = len(columns["labels"])
+        start = 0
+        while start < count:
+            take = min(count - start, self.shard_size - self._buffered)
+            for name, col in columns.items():
+                self._buffer.setdefault(name, []).append(col[start:start + take])
+            self._buffered += take
+            start += take
+            if self._buffered == self.shard_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        name = f"{self.prefix}-{len(self.shards):05d}"
+        for field, parts in self._buffer.items():
+            np.save(os.path.join(self.out_dir, f"{name}.{field}.npy"), np.concatenate(parts))
+        self.shards.append({"name": name, "count": self._buffered})
+        self._buffer = {}
+        self._buffered = 0
+
+    def close(self):
+        """Flush the last partial shard and write the manifest."""
+        self._flush()
+        manifest = {
+            "version": FORMAT_VERSION,
+            "plane_shape": list(PLANE_SHAPE),
+            "plane_encoding": "packbits-little",
+            "fields": self.fields or {},
+            "num_examples": sum(shard["count"] for shard in self.shards),
+            "shards": self.shards,
+            "attrs": self.attrs,
+        }
+        with open(os.path.join(self.out_dir, self.manifest), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+def merge_manifests(data_dir, names, remove=True):
+    """Join the part manifests written into data_dir by several ShardWriters into one MANIFEST.
+
+    Shards are listed in the order of names; parts without any shards are
+    skipped. The part manifest files are deleted unless remove=False.
+    """
+    merged = None
+    for name in names:
+        with open(os.path.join(data_dir, name)) as f:
+            part = json.load(f)
+        if not part["shards"]:
+            continue
+        if merged is None:
+            merged = dict(part, shards=[], num_examples=0)
+        elif part["fields"] != merged["fields"]:
+            raise ValueError(f"{name} has fields {sorted(part['fields'])}, expected {sorted(merged['fields'])}")
+        merged["shards"] += part["shards"]
+        merged["num_examples"] += part["num_examples"]
+    if merged is None:
+        merged = {"version": FORMAT_VERSION, "plane_shape": list(PLANE_SHAPE), "plane_encoding": "packbits-little",
+                  "fields": {}, "num_examples": 0, "shards": [], "attrs": {}}
+    with open(os.path.join(data_dir, MANIFEST), "w") as f:
+        json.dump(merged, f, indent=2)
+    if remove:
+        for name in names:
+            os.remove(os.path.join(data_dir, name))
+    return merged
+
+class ShardedDataset:
+    """Read a sharded dataset through memory maps without loading it into RAM."""
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        with open(os.path.join(data_dir, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported dataset version {self.manifest['version']}")
+        self.shards = self.manifest["shards"]
+        self.fields = list(self.manifest["fields"])
+        self.attrs = self.manifest.get("attrs", {})
+        self.offsets = np.cumsum([0] + [shard["count"] for shard in self.shards])
+        self._cache = {}
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def shard(self, i, field):
+        """Memory-map one field of shard i."""
+        key = (i, field)
+        if key not in self._cache:
+            path = os.path.join(self.data_dir, f"{self.shards[i]['name']}.{field}.npy")
+            self._cache[key] = np.load(path, mmap_mode='r')
+        return self._cache[key]
+
+    def read(self, start, stop, fields=("planes", "labels")):
+        """Return {field: array} for global rows [start, stop), crossing shards as needed."""
+        parts = {field: [] for field in fields}
+        i = int(np.searchsorted(self.offsets, start, side='right')) - 1
+        while start < stop and i < len(self.shards):
+            lo = start - self.offsets[i]
+            hi = min(stop, self.offsets[i + 1]) - self.offsets[i]
+            for field in fields:
+                parts[field].append(self.shard(i, field)[lo:hi])
+            start = self.offsets[i] + hi
+            i += 1
+        return {field: np.concatenate(chunks) for field, chunks in parts.items()}
+
+    def iter_batches(self, batch_size, fields=("planes", "labels")):
+        """Yield dicts of batch_size rows in storage order."""
+        for start in range(0, len(self), batch_size):
+            yield self.read(start, min(start + batch_size, len(self)), fields)
@@ -0,0 +1,210 @@
+import json
+from collections import OrderedDict
+
+import chess
+import chess.polyglot
+import numpy as np
+
+from board_encoding import PLANES, boards_to_tensor
+from instrumentation import STATS
+from move_vocab import NUM_MOVES, encode_moves, encode_ucis
+
+def load_keras_model(model_path):
+    """Load a saved Keras model for inference (TensorFlow is imported lazily)."""
+    import tensorflow as tf
+    return tf.keras.models.load_model(model_path, compile=False)
+
+class NumpyPolicyModel:
+    """Run a model exported by export_model.export_npz with NumPy alone (no TensorFlow import).
+
+    Quantized weights are expanded to float32 once at load time, so a call
+    is a chain of BLAS matrix products. Called like a Keras model.
+    """
+
+    def __init__(self, path):
+        with np.load(path) as weights:
+            self.quantization = str(weights['quantization'])
+            self.activations = [str(a) for a in weights['activations']]
+            self.kernels = []
+            self.biases = []
+            for i in range(len(self.activations)):
+                kernel = weights[f'kernel{i}'].astype(np.float32)
+                if f'scale{i}' in weights:
+                    kernel *= weights[f'scale{i}']  # Per-output-channel int8 scales
+                self.kernels.append(kernel)
+                self.biases.append(weights[f'bias{i}'].astype(np.float32))
+
+    def __call__(self, x, training=False):
+        h = np.asarray(x, dtype=np.float32).reshape(len(x), -1)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            h = h @ kernel
+            h += bias
+            if activation == 'relu':
+                np.maximum(h, 0, out=h)
+            elif activation == 'softmax':
+                h -= h.max(axis=1, keepdims=True)
+                np.exp(h, out=h)
+                h /= h.sum(axis=1, keepdims=True)
+        return h
+
+class TFLitePolicyModel:
+    """Run a .tflite export, preferring the standalone LiteRT/tflite runtimes over TensorFlow."""
+
+    def __init__(self, path):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=path)
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = None
+
+    def __call__(self, x, training=False):
+        x = np.asarray(x, dtype=np.float32)
+        if len(x) != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_index, list(x.shape))
+            self.interpreter.allocate_tensors()
+            self.batch_size = len(x)
+        self.interpreter.set_tensor(self.input_index, x)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index)
+
+def load_model(model_path):
+    """Load a policy model for inference, picking the runtime from the file extension."""
+    if model_path.endswith(".npz"):
+        return NumpyPolicyModel(model_path)
+    if model_path.endswith(".tflite"):
+        return TFLitePolicyModel(model_path)
+    return load_keras_model(model_path)
+
+def load_output_columns(mapping_path):
+    """Map each vocabulary move to its column in the model output (-1 if the model has none)."""
+    if mapping_path is None:
+        return np.arange(NUM_MOVES)
+    with open(mapping_path) as f:
+        idx_to_move = json.load(f)
+    columns = np.full(NUM_MOVES, -1, dtype=np.int64)
+    outputs = np.array([int(idx) for idx in idx_to_move], dtype=np.int64)
+    vocab = encode_ucis(list(idx_to_move.values()))
+    known = vocab >= 0
+    columns[vocab[known]] = outputs[known]
+    return columns
+
+class MoveEngine:
+    """Choose moves with the policy network, restricted to legal moves.
+
+    Boards are encoded and evaluated in batches by calling the model
+    directly, and the legal-move policy for each position is kept in an
+    LRU cache keyed by Zobrist hash so repeated positions skip the network.
+    model_path may also point at an .npz export (see export_model.py),
+    which runs without importing TensorFlow, or at a .tflite export.
+    If book (an opening_book.OpeningBook) is given, best_move answers from
+    it while the position is in book, without touching the network.
+    """
+
+    def __init__(self, model_path="data/chess_model.h5", mapping_path="data/idx_to_move.json",
+                 model=None, cache_size=100000, max_batch=256, book=None):
+        self.model = model if model is not None else load_model(model_path)
+        self.columns = load_output_columns(mapping_path)
+        self.cache_size = cache_size
+        self.max_batch = max_batch
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.book = book
+        self.book_hits = 0
+        self._buffer = np.empty((max_batch, PLANES, 8, 8), dtype=np.float32)
+
+    def _forward(self, x):
+        """Run the model on a batch of encoded boards and return probabilities as NumPy."""
+        return np.asarray(self.model(x, training=False))
+
+    def _evaluate(self, boards):
+        """Compute (legal moves, legal-move probabilities) for boards, in batches."""
+        results = []
+        for start in range(0, len(boards), self.max_batch):
+            chunk = boards[start:start + self.max_batch]
+            with STATS.timer('inference'):
+                probs = self._forward(boards_to_tensor(chunk, out=self._buffer))
+            STATS.incr('inference_positions', len(chunk))
+            for row, board in zip(probs, chunk):
+                moves = list(board.legal_moves)
+                columns = self.columns[encode_moves(moves)]
+                # Vectorized legal-move mask: gather only the legal columns
+                priors = np.where(columns >= 0, row[np.maximum(columns, 0)], 0.0)
+                total = priors.sum()
+                priors = priors / total if total > 0 else np.full(len(moves), 1.0 / max(len(moves), 1))
+                results.append((moves, priors))
+        return results
+
+    def policies(self, boards):
+        """Return (legal moves, normalized priors) for each board, using the cache where possible."""
+        keys = [chess.polyglot.zobrist_hash(board) for board in boards]
+        results = [None] * len(boards)
+        missing = {}
+        hits = 0
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                hits += 1
+                results[i] = cached
+            else:
+                missing.setdefault(key, []).append(i)
+        self.cache_hits += hits
+        self.cache_misses += len(missing)
+        STATS.incr('engine_cache_hits', hits)
+        STATS.incr('engine_cache_misses', len(missing))
+
+        if missing:
+            todo = [boards[indices[0]] for indices in missing.values()]
+            for (key, indices), result in zip(missing.items(), self._evaluate(todo)):
+                for i in indices:
+                    results[i] = result
+                self.cache[key] = result
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return results
+
+    def best_moves(self, boards):
+        """Return the book move or else the highest-probability legal move for each board.
+
+        Boards without legal moves get None.
+        """
+        results = [None] * len(boards)
+        todo = []
+        for i, board in enumerate(boards):
+            move = self.book.choose_move(board) if self.book is not None else None
+            if move is not None:
+                self.book_hits += 1
+                STATS.incr('book_hits')
+                results[i] = move
+            else:
+                todo.append(i)
+        for i, (moves, priors) in zip(todo, self.policies([boards[i] for i in todo])):
+            results[i] = moves[int(np.argmax(priors))] if moves else None
+        return results
+
+    def best_move(self, board, time_limit=None):
+        """Return the highest-probability legal move for one board.
+
+        time_limit is accepted for interface compatibility with the search
+        engines; a single forward pass needs no budget.
+        """
+        return self.best_moves([board])[0]
+
+    def cache_stats(self):
+        """Return cache size and hit rate."""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'size': len(self.cache),
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'hit_rate': self.cache_hits / lookups if lookups else 0.0,
+            'book_hits': self.book_hits,
+        }
@@ -0,0 +1,164 @@
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from board_encoding import boards_to_tensor, random_boards
+from engine import load_keras_model, load_model
+
+QUANTIZATIONS = ("float32", "float16", "int8")
+
+def dense_layers(model):
+    """Return [(kernel, bias, activation)] for a Keras model made of Flatten, Dropout and Dense layers."""
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in ("Flatten", "Dropout", "InputLayer"):
+            continue  # Flatten is a reshape and dropout is inactive at inference time
+        if kind != "Dense":
+            raise ValueError(f"Cannot export layer {layer.name} of type {kind}")
+        kernel, bias = layer.get_weights()
+        layers.append((kernel, bias, layer.get_config()["activation"]))
+    return layers
+
+def quantize_int8(kernel):
+    """Symmetric per-output-channel int8 quantization: kernel ~= q * scale."""
+    scale = np.abs(kernel).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    q = np.clip(np.rint(kernel / scale), -127, 127).astype(np.int8)
+    return q, scale.astype(np.float32)
+
+def export_npz(model, path, quantization="float16"):
+    """Write the dense weights of model to an .npz file for engine.NumpyPolicyModel."""
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"quantization must be one of {QUANTIZATIONS}")
+    layers = dense_layers(model)
+    arrays = {
+        'quantization': np.array(quantization),
+        'activations': np.array([activation for _, _, activation in layers]),
+    }
+    for i, (kernel, bias, _) in enumerate(layers):
+        if quantization == "int8":
+            arrays[f'kernel{i}'], arrays[f'scale{i}'] = quantize_int8(kernel)
+        else:
+            arrays[f'kernel{i}'] = kernel.astype(quantization)
+        arrays[f'bias{i}'] = bias.astype(np.float32)
+    np.savez(path, **arrays)
+    return path
+
+def export_tflite(model, path, quantization="float16"):
+    """Convert model to TFLite with float16 or dynamic-range int8 weights."""
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization != "float32":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+    return path
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where it cannot be measured."""
+    try:
+        # ru_maxrss survives exec, so a spawned child would report its parent's peak; VmHWM does not
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import resource  # Unix only
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss) / 2**20  # peak_wset is Windows' peak working set
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS but KiB on Linux and the BSDs
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024.0
+
+def _load_cost(model_path):
+    """Run in a fresh process: time to import and load a model, and the process's peak RSS in MB."""
+    start = time.perf_counter()
+    model = load_model(model_path)
+    model(np.zeros((1, 12, 8, 8), dtype=np.float32), training=False)
+    elapsed = time.perf_counter() - start
+    return elapsed, _peak_rss_mb()
+
+def benchmark(reference_path, model_paths, num_boards=2048, batch_size=256, repeats=200, seed=0):
+    """Compare exported models with the reference .h5.
+
+    For each model reports load time and peak RSS (measured in a fresh
+    process so TensorFlow's import is counted), single-position latency,
+    batched throughput, and how often its top-1 output agrees with the
+    reference on random positions.
+    """
+    x = boards_to_tensor(random_boards(num_boards, seed=seed))
+    reference = np.asarray(load_keras_model(reference_path)(x, training=False))
+    reference_top1 = reference.argmax(axis=1)
+
+    results = {}
+    for path in [reference_path] + list(model_paths):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            load_seconds, peak_rss_mb = executor.submit(_load_cost, path).result()
+        model = load_model(path)
+
+        single = x[:1]
+        model(single, training=False)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(single, training=False)
+            timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        outputs = [np.asarray(model(x[i:i + batch_size], training=False)) for i in range(0, len(x), batch_size)]
+        elapsed = time.perf_counter() - start
+        probs = np.concatenate(outputs)
+
+        results[path] = {
+            'file_mb': os.path.getsize(path) / 2**20,
+            'load_seconds': load_seconds,
+            'peak_rss_mb': peak_rss_mb,
+            'latency_ms_p50': float(np.median(timings)) * 1000,
+            'positions_per_sec': len(x) / elapsed,
+            'top1_agreement': float((probs.argmax(axis=1) == reference_top1).mean()),
+            'max_abs_error': float(np.abs(probs - reference).max()),
+        }
+        logging.info("%s: %s", path, results[path])
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the move model for TensorFlow-free inference and benchmark it.")
+    parser.add_argument("--model", default="data/chess_model.h5")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default="float16")
+    parser.add_argument("--tflite", action="store_true", help="Also write a .tflite model")
+    parser.add_argument("--benchmark", action="store_true", help="Compare the exports with the original model")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    model = load_keras_model(args.model)
+    stem = os.path.splitext(args.model)[0] + f"_{args.quantization}"
+    exports = [export_npz(model, stem + ".npz", args.quantization)]
+    if args.tflite:
+        exports.append(export_tflite(model, stem + ".tflite", args.quantization))
+    print(f"Wrote {', '.join(exports)}")
+
+    if args.benchmark:
+        results = benchmark(args.model, exports)
+        print(f"{'model':<40} {'MB':>6} {'load s':>7} {'RSS MB':>7} {'p50 ms':>7} {'pos/s':>9} {'top-1':>6}")
+        for path, r in results.items():
+            rss = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else "n/a"
+            print(f"{os.path.basename(path):<40} {r['file_mb']:>6.1f} {r['load_seconds']:>7.2f} "
+                  f"{rss:>7} {r['latency_ms_p50']:>7.3f} {r['positions_per_sec']:>9,.0f} "
+                  f"{r['top1_agreement']:>6.1%}")
@@ -0,0 +1,206 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+class Stats:
+    """Thread-safe counters, gauges and timers for hot paths.
+
+    Each operation is a dict update under a lock, cheap enough to call per
+    frame or per batch. Timers keep running totals plus the most recent
+    `window` samples for percentiles.
+    """
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.started = time.perf_counter()
+        self.counters = Counter()
+        self.gauges = {}
+        self.timers = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def record(self, name, seconds):
+        """Add one timing sample (in seconds) to timer name."""
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'recent': deque(maxlen=self.window)}
+            timer['count'] += 1
+            timer['total'] += seconds
+            timer['max'] = max(timer['max'], seconds)
+            timer['recent'].append(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timer_summary(self, name):
+        """Return count, mean and recent p50/p95/max in milliseconds for one timer, or None."""
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None or not timer['count']:
+                return None
+            recent = np.array(timer['recent'])
+            count, total, longest = timer['count'], timer['total'], timer['max']
+        return {
+            'count': count,
+            'mean_ms': 1000 * total / count,
+            'p50_ms': 1000 * float(np.percentile(recent, 50)),
+            'p95_ms': 1000 * float(np.percentile(recent, 95)),
+            'max_ms': 1000 * longest,
+        }
+
+    def ratio(self, hits, misses):
+        """hits / (hits + misses) for two counters, or 0.0 before any lookups."""
+        total = self.counters[hits] + self.counters[misses]
+        return self.counters[hits] / total if total else 0.0
+
+    def snapshot(self):
+        """Return all counters, gauges and timer summaries as a JSON-serializable dict."""
+        with self._lock:
+            counters = dict(self.counters)
+            timer_names = list(self.timers)
+        return {
+            'uptime_s': time.perf_counter() - self.started,
+            'counters': counters,
+            'gauges': dict(self.gauges),
+            'timers': {name: self.timer_summary(name) for name in timer_names},
+        }
+
+    def reset(self):
+        with self._lock:
+            self.started = time.perf_counter()
+            self.counters.clear()
+            self.gauges.clear()
+            self.timers.clear()
+
+# Process-wide registry used by the game, engine, data prep and training
+STATS = Stats()
+
+class StatsFile:
+    """Append periodic JSON-lines snapshots of a Stats registry to a file.
+
+    Each line also carries per-second rates of every counter since the
+    previous line, e.g. PGN games/s or training examples/s. Call
+    maybe_write() from a loop; it only writes once every `interval` seconds.
+    """
+
+    def __init__(self, path, interval=10.0, stats=STATS, **extra):
+        self.path = path
+        self.interval = interval
+        self.stats = stats
+        self.extra = extra
+        self.last_time = time.perf_counter()
+        self.last_counters = dict(stats.counters)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def maybe_write(self, **fields):
+        if time.perf_counter() - self.last_time >= self.interval:
+            self.write(**fields)
+
+    def write(self, **fields):
+        now = time.perf_counter()
+        snapshot = self.stats.snapshot()
+        elapsed = max(now - self.last_time, 1e-9)
+        snapshot['rates'] = {name: (value - self.last_counters.get(name, 0)) / elapsed
+                             for name, value in snapshot['counters'].items()}
+        snapshot['time'] = time.time()
+        snapshot.update(self.extra)
+        snapshot.update(fields)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(snapshot) + "\n")
+        self.last_time = now
+        self.last_counters = snapshot['counters']
+
+class SamplingProfiler:
+    """Sample one thread's Python stack every `interval` seconds from a background thread.
+
+    Unlike cProfile it adds no per-call overhead, so it suits the render
+    loop. Samples are written in collapsed-stack format ("a;b;c count"),
+    which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+@contextmanager
+def profiled(path=None, mode="cprofile", top=25):
+    """Profile the enclosed block when path is set (or $CHESS_PROFILE is), and do nothing otherwise.
+
+    mode "cprofile" writes a pstats file to path and logs the top functions
+    by cumulative time; mode "sample" runs SamplingProfiler and writes
+    collapsed stacks.
+    """
+    path = path or os.environ.get("CHESS_PROFILE")
+    if not path:
+        yield
+        return
+    if mode == "sample":
+        profiler = SamplingProfiler().start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            profiler.write(path)
+            logging.info("Wrote %d stack samples to %s", sum(profiler.samples.values()), path)
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(top)
+        logging.info("Wrote profile to %s\n%s", path, report.getvalue())
@@ -0,0 +1,247 @@
+import logging
+import math
+import time
+from collections import namedtuple
+
+import chess
+import numpy as np
+
+from move_vocab import encode_moves, index_to_move, move_index
+from search import evaluate
+
+MAX_LEGAL_MOVES = 218  # Most legal moves in any chess position, so the most children one expansion adds
+
+MCTSResult = namedtuple('MCTSResult', ['move', 'visits', 'simulations', 'elapsed', 'sims_per_sec', 'tree_size'])
+
+def material_value(board):
+    """Squash the static material evaluation into a [-1, 1] value for the side to move."""
+    return math.tanh(evaluate(board) / 400.0)
+
+class MCTS:
+    """PUCT Monte Carlo Tree Search with the policy network as priors.
+
+    The tree lives in flat NumPy arrays: every node has a parent, the
+    vocabulary index of the move leading to it, a prior, visit/value totals
+    and a contiguous block of children. Each round descends batch_size
+    paths with virtual loss so they spread over different leaves, then
+    evaluates all those leaves in one policy.policies call. The subtree
+    under the move actually played is kept for the next search.
+    """
+
+    def __init__(self, policy, value_fn=material_value, capacity=1 << 18, c_puct=1.5,
+                 batch_size=32, virtual_loss=1.0):
+        self.policy = policy
+        self.value_fn = value_fn
+        self.capacity = capacity
+        self.c_puct = c_puct
+        self.batch_size = batch_size
+        self.virtual_loss = virtual_loss
+
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.move = np.full(capacity, -1, dtype=np.int16)
+        self.prior = np.zeros(capacity, dtype=np.float32)
+        self.visits = np.zeros(capacity, dtype=np.float32)
+        self.value_sum = np.zeros(capacity, dtype=np.float32)
+        self.virtual = np.zeros(capacity, dtype=np.float32)
+        self.first_child = np.zeros(capacity, dtype=np.int32)
+        self.num_children = np.zeros(capacity, dtype=np.int32)
+        self.expanded = np.zeros(capacity, dtype=bool)
+        self.terminal_value = np.full(capacity, np.nan, dtype=np.float32)
+        self.size = 0
+        self.root_board = None
+        self._reset()
+
+    _FIELDS = ('parent', 'move', 'prior', 'visits', 'value_sum', 'virtual',
+               'first_child', 'num_children', 'expanded', 'terminal_value')
+
+    def _reset(self):
+        self.size = 1
+        self.parent[0] = -1
+        self.move[0] = -1
+        self.visits[0] = 0
+        self.value_sum[0] = 0
+        self.virtual[0] = 0
+        self.num_children[0] = 0
+        self.expanded[0] = False
+        self.terminal_value[0] = np.nan
+
+    def best_move(self, board, time_limit=None):
+        """Return the most visited move after searching for time_limit seconds (1s by default)."""
+        return self.search(board, time_limit=time_limit or 1.0).move
+
+    def search(self, board, time_limit=1.0, simulations=None):
+        """Run simulations until time_limit or the simulation count is reached, returning an MCTSResult."""
+        self._reuse_tree(board)
+        start = time.perf_counter()
+        done = 0
+        while True:
+            if simulations is not None and done >= simulations:
+                break
+            if time_limit is not None and time.perf_counter() - start >= time_limit:
+                break
+            # Every leaf in a batch may add MAX_LEGAL_MOVES children, so shrink the batch to the room left
+            room = (self.capacity - self.size) // MAX_LEGAL_MOVES
+            if room < 1:
+                logging.warning("MCTS tree is full; stopping search early")
+                break
+            done += self._run_batch(min(self.batch_size, room))
+            if self.expanded[0] and self.num_children[0] == 0:
+                break
+
+        elapsed = time.perf_counter() - start
+        if not self.num_children[0]:
+            return MCTSResult(None, 0, done, elapsed, 0.0, self.size)
+        children = slice(self.first_child[0], self.first_child[0] + self.num_children[0])
+        best = self.first_child[0] + int(np.argmax(self.visits[children]))
+        result = MCTSResult(index_to_move(int(self.move[best])), int(self.visits[best]), done, elapsed,
+                            done / max(elapsed, 1e-9), self.size)
+        logging.info("MCTS: %d simulations in %.2fs (%.0f/s), tree %d nodes, best %s (%d visits)",
+                     done, elapsed, result.sims_per_sec, self.size, result.move, result.visits)
+        return result
+
+    def _reuse_tree(self, board):
+        """Re-root the tree at board if it follows from the previous root, otherwise start afresh."""
+        old = self.root_board
+        self.root_board = board.copy()
+        if old is None or old.root().fen() != board.root().fen() \
+                or board.move_stack[:len(old.move_stack)] != old.move_stack:
+            self._reset()
+            return
+        node = 0
+        for move in board.move_stack[len(old.move_stack):]:
+            if not self.num_children[node]:
+                self._reset()
+                return
+            children = np.arange(self.first_child[node], self.first_child[node] + self.num_children[node])
+            match = children[self.move[children] == move_index(move)]
+            if not len(match):
+                self._reset()
+                return
+            node = int(match[0])
+        if node != 0:
+            self._compact(node)
+
+    def _compact(self, new_root):
+        """Copy the subtree under new_root to the front of the arrays, keeping children contiguous."""
+        levels = [np.array([new_root], dtype=np.int64)]
+        frontier = levels[0]
+        while frontier.size:
+            counts = self.num_children[frontier].astype(np.int64)
+            starts = self.first_child[frontier].astype(np.int64)
+            total = int(counts.sum())
+            if not total:
+                break
+            offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+            frontier = offsets + np.arange(total)
+            levels.append(frontier)
+        order = np.concatenate(levels)
+        remap = np.full(self.size, -1, dtype=np.int64)
+        remap[order] = np.arange(len(order))
+        for name in self._FIELDS:
+            array = getattr(self, name)
+            array[:len(order)] = array[order]
+        # Leaves keep stale first_child values, so only remap nodes that have children
+        first_child = self.first_child[:len(order)]
+        has_children = self.num_children[:len(order)] > 0
+        first_child[has_children] = remap[first_child[has_children]]
+        first_child[~has_children] = 0
+        parents = self.parent[:len(order)]
+        self.parent[:len(order)] = np.where(parents >= 0, remap[np.maximum(parents, 0)], -1)
+        self.parent[0] = -1
+        self.move[0] = -1
+        self.size = len(order)
+
+    def _select_child(self, node):
+        start = self.first_child[node]
+        children = slice(start, start + self.num_children[node])
+        visits = self.visits[children] + self.virtual[children]
+        values = self.value_sum[children] - self.virtual[children]
+        q = np.where(visits > 0, values / np.maximum(visits, 1), 0.0)
+        u = self.c_puct * self.prior[children] * math.sqrt(visits.sum() + 1) / (1 + visits)
+        return start + int(np.argmax(q + u))
+
+    def _backup(self, path, value):
+        """Propagate a leaf value (from the leaf's side to move) up the path, removing virtual loss."""
+        # Each node's value_sum is from the point of view of the player who moved into it
+        for node in reversed(path):
+            value = -value
+            self.value_sum[node] += value
+            self.visits[node] += 1
+        self.virtual[path[1:]] -= self.virtual_loss  # The root never receives virtual loss
+
+    def _run_batch(self, batch_size):
+        """Descend up to batch_size paths, evaluate their leaves in one forward pass and back up."""
+        leaves = []
+        pending = set()
+        for _ in range(batch_size):
+            node = 0
+            board = self.root_board.copy()
+            path = [0]
+            while self.expanded[node] and self.num_children[node]:
+                node = self._select_child(node)
+                self.virtual[node] += self.virtual_loss
+                board.push(index_to_move(int(self.move[node])))
+                path.append(node)
+            if self.expanded[node]:
+                # Terminal node: its value is known, no network call needed
+                self._backup(path, float(self.terminal_value[node]))
+                continue
+            if node in pending:
+                # Another path in this batch already reached this leaf; undo and stop collecting
+                for visited in path[1:]:
+                    self.virtual[visited] -= self.virtual_loss
+                break
+            pending.add(node)
+            leaves.append((node, board, path))
+
+        if not leaves:
+            return batch_size
+        policies = self.policy.policies([board for _, board, _ in leaves])
+        for (node, board, path), (moves, priors) in zip(leaves, policies):
+            self._expand(node, board, moves, priors)
+            if moves:
+                value = self.value_fn(board)
+            else:
+                value = -1.0 if board.is_check() else 0.0
+                self.terminal_value[node] = value
+            self._backup(path, value)
+        return len(leaves)
+
+    def _expand(self, node, board, moves, priors):
+        count = len(moves)
+        start = self.size
+        self.expanded[node] = True
+        self.num_children[node] = count
+        self.first_child[node] = start
+        if not count:
+            return
+        block = slice(start, start + count)
+        self.parent[block] = node
+        self.move[block] = encode_moves(moves)
+        self.prior[block] = priors
+        self.visits[block] = 0
+        self.value_sum[block] = 0
+        self.virtual[block] = 0
+        self.num_children[block] = 0
+        self.expanded[block] = False
+        self.terminal_value[block] = np.nan
+        self.size += count
+
+if __name__ == "__main__":
+    import argparse
+
+    from engine import MoveEngine
+
+    parser = argparse.ArgumentParser(description="Run MCTS on a position and report simulations per second.")
+    parser.add_argument("fen", nargs="?", default=chess.STARTING_FEN)
+    parser.add_argument("--time", type=float, default=2.0, help="Time budget in seconds")
+    parser.add_argument("--batch-size", type=int, default=32, help="Leaves evaluated per forward pass")
+    parser.add_argument("--model", default="data/chess_model.h5")
+    parser.add_argument("--mapping", default="data/idx_to_move.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    tree = MCTS(MoveEngine(args.model, args.mapping), batch_size=args.batch_size)
+    result = tree.search(chess.Board(args.fen), time_limit=args.time)
+    print(f"Best move {result.move} ({result.visits} visits, {result.simulations} simulations, "
+          f"{result.sims_per_sec:,.0f}/s, tree {result.tree_size} nodes)")
@@ -0,0 +1,80 @@
+import chess
+import numpy as np
+
+# Promotion piece types in UCI suffix order; index 0 means "no promotion"
+PROMOTION_CHARS = " pnbrqk"
+
+def _is_reachable(from_square, to_square):
+    """True if a queen or a knight could move between the two squares."""
+    df = chess.square_file(to_square) - chess.square_file(from_square)
+    dr = chess.square_rank(to_square) - chess.square_rank(from_square)
+    if df == 0 and dr == 0:
+        return False
+    if df == 0 or dr == 0 or abs(df) == abs(dr):
+        return True
+    return {abs(df), abs(dr)} == {1, 2}
+
+def _build_vocab():
+    """List every geometrically possible UCI move, ordered by (from, to, promotion)."""
+    moves = []
+    for from_square in chess.SQUARES:
+        for to_square in chess.SQUARES:
+            if not _is_reachable(from_square, to_square):
+                continue
+            moves.append((from_square, to_square, 0))
+            from_rank = chess.square_rank(from_square)
+            to_rank = chess.square_rank(to_square)
+            df = abs(chess.square_file(to_square) - chess.square_file(from_square))
+            if df <= 1 and (from_rank, to_rank) in ((6, 7), (1, 0)):
+                for piece_type in (chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN):
+                    moves.append((from_square, to_square, piece_type))
+    return np.array(moves, dtype=np.uint8)
+
+_VOCAB = _build_vocab()
+
+# Decode tables: index -> from square, to square, promotion piece type (0 = none), UCI string
+MOVE_FROM = _VOCAB[:, 0].copy()
+MOVE_TO = _VOCAB[:, 1].copy()
+MOVE_PROMOTION = _VOCAB[:, 2].copy()
+MOVE_UCI = [chess.Move(int(f), int(t), int(p) or None).uci() for f, t, p in _VOCAB]
+NUM_MOVES = len(MOVE_UCI)  # 1968
+
+# Encode table: [from, to, promotion piece type] -> index, or -1 if impossible
+MOVE_INDEX = np.full((64, 64, 7), -1, dtype=np.int16)
+MOVE_INDEX[MOVE_FROM, MOVE_TO, MOVE_PROMOTION] = np.arange(NUM_MOVES, dtype=np.int16)
+
+_PROMOTION_CODE = np.zeros(256, dtype=np.uint8)
+for _piece_type, _char in enumerate(PROMOTION_CHARS):
+    if _char != " ":
+        _PROMOTION_CODE[ord(_char)] = _piece_type
+
+def move_index(move):
+    """Return the vocabulary index of a chess.Move, or -1 if it has none."""
+    return int(MOVE_INDEX[move.from_square, move.to_square, move.promotion or 0])
+
+def index_to_move(index):
+    """Return the chess.Move for a vocabulary index."""
+    return chess.Move(int(MOVE_FROM[index]), int(MOVE_TO[index]), int(MOVE_PROMOTION[index]) or None)
+
+def encode_ucis(ucis):
+    """Vectorized encoding of a sequence of UCI strings to int32 indices (-1 for unknown moves)."""
+    if not len(ucis):
+        return np.empty(0, dtype=np.int32)
+    chars = np.array(ucis, dtype='S5').view(np.uint8).reshape(-1, 5).astype(np.int32)
+    files_ok = ((chars[:, [0, 2]] >= ord('a')) & (chars[:, [0, 2]] <= ord('h'))).all(axis=1)
+    ranks_ok = ((chars[:, [1, 3]] >= ord('1')) & (chars[:, [1, 3]] <= ord('8'))).all(axis=1)
+    valid = files_ok & ranks_ok
+    from_square = np.where(valid, (chars[:, 0] - ord('a')) + 8 * (chars[:, 1] - ord('1')), 0)
+    to_square = np.where(valid, (chars[:, 2] - ord('a')) + 8 * (chars[:, 3] - ord('1')), 0)
+    promotion = _PROMOTION_CODE[chars[:, 4]]
+    return np.where(valid, MOVE_INDEX[from_square, to_square, promotion], -1).astype(np.int32)
+
+def encode_moves(moves):
+    """Vectorized encoding of a sequence of chess.Move objects to int32 indices."""
+    squares = np.array([(m.from_square, m.to_square, m.promotion or 0) for m in moves], dtype=np.int64).reshape(-1, 3)
+    return MOVE_INDEX[squares[:, 0], squares[:, 1], squares[:, 2]].astype(np.int32)
+
+def legal_move_indices(board):
+    """Return (legal moves, their vocabulary indices) for a board."""
+    moves = list(board.legal_moves)
+    return moves, encode_moves(moves)
@@ -0,0 +1,217 @@
+import bisect
+import io
+import logging
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+import chess.pgn
+import chess.polyglot
+import numpy as np
+
+from prepare_data import find_chunk_offsets
+
+# Polyglot .bin entry: 16 big-endian bytes, sorted by key
+BOOK_ENTRY = np.dtype([('key', '>u8'), ('move', '>u2'), ('weight', '>u2'), ('learn', '>u4')])
+
+RESULT_POINTS = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}  # (White, Black) points per game
+
+def encode_move(board, move):
+    """Encode a move in Polyglot's 16-bit format (castling as king takes own rook)."""
+    to_square = move.to_square
+    if board.is_castling(move):
+        rook_file = 7 if chess.square_file(move.to_square) > chess.square_file(move.from_square) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+    promotion = move.promotion - 1 if move.promotion else 0  # Knight = 1 ... queen = 4
+    return to_square | (move.from_square << 6) | (promotion << 12)
+
+def decode_move(board, raw):
+    """Inverse of encode_move for the position the entry belongs to."""
+    from_square, to_square, promotion = (raw >> 6) & 63, raw & 63, (raw >> 12) & 7
+    if (board.piece_type_at(from_square) == chess.KING and board.piece_type_at(to_square) == chess.ROOK
+            and board.color_at(to_square) == board.turn):
+        king_file = 6 if to_square > from_square else 2
+        to_square = chess.square(king_file, chess.square_rank(from_square))
+    return chess.Move(from_square, to_square, promotion + 1 if promotion else None)
+
+def _aggregate(keys, moves, games, points):
+    """Sum games and points over identical (key, move) pairs; returns arrays sorted by key then move."""
+    if not len(keys):
+        return keys, moves, games, points
+    order = np.lexsort((moves, keys))
+    keys, moves, games, points = keys[order], moves[order], games[order], points[order]
+    new = np.ones(len(keys), dtype=bool)
+    new[1:] = (keys[1:] != keys[:-1]) | (moves[1:] != moves[:-1])
+    starts = np.flatnonzero(new)
+    return keys[starts], moves[starts], np.add.reduceat(games, starts), np.add.reduceat(points, starts)
+
+def _book_chunk(args):
+    """Worker: collect (key, move, games, points) for the first max_ply plies of every game in a byte range."""
+    pgn_file, start, end, max_ply = args
+    with open(pgn_file, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8', errors='replace')
+    pgn = io.StringIO(text)
+    keys = []
+    moves = []
+    points = []
+    while True:
+        game = chess.pgn.read_game(pgn)
+        if game is None:
+            break
+        result = RESULT_POINTS.get(game.headers.get("Result"))
+        if result is None:
+            continue  # Unfinished or unknown result
+        board = game.board()
+        for move in game.mainline_moves():
+            if board.ply() >= max_ply:
+                break
+            keys.append(chess.polyglot.zobrist_hash(board))
+            moves.append(encode_move(board, move))
+            points.append(result[0] if board.turn == chess.WHITE else result[1])
+            board.push(move)
+    return _aggregate(np.array(keys, dtype=np.uint64), np.array(moves, dtype=np.uint16),
+                      np.ones(len(keys), dtype=np.int64), np.array(points, dtype=np.int64))
+
+def build_book(pgn_file, out_path, max_ply=20, min_games=2, workers=None, chunk_bytes=1 << 20, merge_every=64):
+    """Aggregate opening statistics from a PGN file into a Polyglot book at out_path.
+
+    Chunks are parsed in a process pool (at most 2 * workers in flight) and
+    their (position, move) counts are merged every merge_every chunks, so
+    memory grows with the number of distinct opening moves rather than the
+    corpus size. Each move's weight is 2 points per win plus 1 per draw for
+    the side that played it, scaled per position to fit 16 bits; moves
+    seen in fewer than min_games games are dropped. Moves that only ever
+    lost get weight 0, which OpeningBook skips at its default min_weight=1.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = iter(find_chunk_offsets(pgn_file, chunk_bytes))
+    parts = []
+    start = time.perf_counter()
+    total_moves = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+
+        def submit_next():
+            for chunk_start, chunk_end in chunks:
+                in_flight.append(executor.submit(_book_chunk, (pgn_file, chunk_start, chunk_end, max_ply)))
+                return
+
+        for _ in range(2 * workers):
+            submit_next()
+
+        while in_flight:
+            part = in_flight.popleft().result()
+            submit_next()
+            total_moves += int(part[2].sum())
+            parts.append(part)
+            if len(parts) >= merge_every:
+                parts = [_aggregate(*(np.concatenate(column) for column in zip(*parts)))]
+
+    if parts:
+        keys, moves, games, points = _aggregate(*(np.concatenate(column) for column in zip(*parts)))
+    else:
+        keys, moves, games, points = (np.empty(0, dtype=dtype) for dtype in (np.uint64, np.uint16, np.int64, np.int64))
+    keep = games >= min_games
+    keys, moves, points = keys[keep], moves[keep], points[keep]
+
+    # Scale weights so the best move of each position fits in 16 bits
+    weights = points.astype(np.float64)
+    if len(keys):
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        position_max = np.repeat(np.maximum.reduceat(points, starts), np.diff(np.append(starts, len(keys))))
+        weights *= np.minimum(1.0, 65535.0 / np.maximum(position_max, 1))
+
+    entries = np.zeros(len(keys), dtype=BOOK_ENTRY)
+    entries['key'] = keys
+    entries['move'] = moves
+    entries['weight'] = np.rint(weights).astype(np.uint16)
+    entries = entries[np.lexsort((-entries['weight'].astype(np.int64), entries['key']))]
+    entries.tofile(out_path)
+    logging.info("Book: %d opening moves -> %d entries (%d positions) in %.1fs",
+                 total_moves, len(entries), len(np.unique(keys)), time.perf_counter() - start)
+    return len(entries)
+
+class OpeningBook:
+    """Memory-mapped Polyglot book with binary-search lookups.
+
+    The file stays on disk; a lookup is a binary search over the
+    memory-mapped keys, so probing touches a few pages and needs no load
+    time. Books written by other Polyglot tools work too. Entries weighing
+    less than min_weight are ignored; pass min_weight=0 to also play the
+    weight-0 moves.
+    """
+
+    def __init__(self, path, min_weight=1, seed=None):
+        self.path = path
+        self.min_weight = min_weight
+        self.entries = np.memmap(path, dtype=BOOK_ENTRY, mode='r') if os.path.getsize(path) else \
+            np.zeros(0, dtype=BOOK_ENTRY)
+        self.keys = self.entries['key']
+        self.rng = random.Random(seed)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def entries_for(self, board):
+        """Return [(raw Polyglot move, weight)] stored for board, without legality checks."""
+        key = chess.polyglot.zobrist_hash(board)
+        # Bisect the big-endian memmap directly: np.searchsorted would byte-swap every key on each call
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_right(self.keys, key, lo)
+        block = self.entries[lo:hi]
+        return [(raw, weight) for raw, weight in zip(block['move'].tolist(), block['weight'].tolist())
+                if weight >= self.min_weight]
+
+    def moves(self, board):
+        """Return [(move, weight)] for board's book entries, best first, legal moves only."""
+        found = []
+        for raw, weight in self.entries_for(board):
+            move = decode_move(board, raw)
+            if board.is_legal(move):  # Guards against hash collisions
+                found.append((move, weight))
+        found.sort(key=lambda item: item[1], reverse=True)
+        return found
+
+    def choose_move(self, board, weighted=True):
+        """Return a book move for board, or None when out of book.
+
+        With weighted=True the move is drawn in proportion to its weight
+        (uniformly when every candidate weighs 0), otherwise the
+        highest-weighted move is returned. Only the chosen entry is decoded
+        and checked for legality.
+        """
+        candidates = self.entries_for(board)
+        while candidates:
+            weights = [weight for _, weight in candidates]
+            if weighted and sum(weights):
+                pick = self.rng.choices(range(len(candidates)), weights=weights)[0]
+            elif weighted:
+                pick = self.rng.randrange(len(candidates))
+            else:
+                pick = max(range(len(candidates)), key=lambda i: candidates[i][1])
+            move = decode_move(board, candidates[pick][0])
+            if board.is_legal(move):
+                return move
+            del candidates[pick]
+        return None
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build a Polyglot opening book from a PGN file.")
+    parser.add_argument("pgn_file", nargs="?", default=r"E:\Project\Chess\lichess_elite_2023-08.pgn")
+    parser.add_argument("--out", default="data/book.bin")
+    parser.add_argument("--max-ply", type=int, default=20, help="Record moves from the first N plies")
+    parser.add_argument("--min-games", type=int, default=2, help="Drop moves seen in fewer games")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    count = build_book(args.pgn_file, args.out, max_ply=args.max_ply, min_games=args.min_games, workers=args.workers)
+    print(f"Wrote {count} entries to {args.out}.")
@@ -1,74 +1,260 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import chess
 import chess.pgn
+import chess.polyglot
 import numpy as np
-import pandas as pd
-from sklearn.model_selection import train_test_split
-
-def board_to_tensor(board):
-    """Convert a chess board to a 12x8x8 tensor (6 piece types x 2 colors)."""
-    tensor = np.zeros((12, 8, 8), dtype=np.float32)
-    piece_map = {
-        chess.PAWN: 0, chess.KNIGHT: 1, chess.BISHOP: 2,
-        chess.ROOK: 3, chess.QUEEN: 4, chess.KING: 5
-    }
-    
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            color_idx = 0 if piece.color == chess.WHITE else 6
-            piece_idx = piece_map[piece.piece_type]
-            rank = chess.square_rank(square)
-            file = chess.square_file(square)
-            tensor[color_idx + piece_idx, rank, file] = 1.0
-    
-    return tensor
-
-def parse_pgn(pgn_file, max_games=1000):
-    """Parse PGN file and extract board states and moves."""
-    boards = []
-    moves = []
-    
-    with open(pgn_file, 'r', encoding='utf-8') as pgn:
-        for i in range(max_games):
-            game = chess.pgn.read_game(pgn)
-            if game is None:
+
+from board_encoding import board_masks, unpack_masks
+from dataset import PACKED_BYTES, ShardWriter, pack_planes
+from instrumentation import STATS, StatsFile, profiled
+from move_vocab import NUM_MOVES, encode_ucis
+
+def find_chunk_offsets(pgn_file, chunk_bytes=1 << 20):
+    """Split a PGN file into (start, end) byte ranges that begin on game boundaries."""
+    size = os.path.getsize(pgn_file)
+    offsets = [0]
+    with open(pgn_file, 'rb') as f:
+        target = chunk_bytes
+        while target < size:
+            f.seek(target)
+            f.readline()  # Skip the (possibly partial) line we landed in
+            pos = f.tell()
+            line = f.readline()
+            while line and not line.startswith(b'[Event '):
+                pos = f.tell()
+                line = f.readline()
+            if not line:
                 break
-            board = game.board()
-            for move in game.mainline_moves():
-                boards.append(board_to_tensor(board))
-                moves.append(move.uci())
-                board.push(move)
-    
-    return np.array(boards), moves
-
-def encode_moves(moves, max_moves=5000):
-    """Encode UCI moves as integer labels."""
-    unique_moves = list(set(moves))
-    if len(unique_moves) > max_moves:
-        unique_moves = unique_moves[:max_moves]
-    move_to_idx = {move: idx for idx, move in enumerate(unique_moves)}
-    labels = [move_to_idx.get(move, len(unique_moves)) for move in moves]
-    return np.array(labels), move_to_idx
+            if pos > offsets[-1]:
+                offsets.append(pos)
+            target = max(pos, target) + chunk_bytes
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+def _header_elo(game, key):
+    try:
+        return int(game.headers.get(key, 0))
+    except ValueError:
+        return 0
+
+def _parse_chunk(args):
+    """Worker: parse every game in one byte range of a PGN file."""
+    pgn_file, start, end, with_keys = args
+    with open(pgn_file, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8', errors='replace')
+    pgn = io.StringIO(text)
+    masks = []
+    moves = []
+    plies = []
+    elos = []
+    keys = []
+    game_lengths = []
+    while True:
+        game = chess.pgn.read_game(pgn)
+        if game is None:
+            break
+        board = game.board()
+        elo = {chess.WHITE: _header_elo(game, 'WhiteElo'), chess.BLACK: _header_elo(game, 'BlackElo')}
+        length = 0
+        for move in game.mainline_moves():
+            masks.append(board_masks(board))
+            moves.append(move.uci())
+            plies.append(board.ply())
+            elos.append(elo[board.turn])
+            if with_keys:
+                keys.append(chess.polyglot.zobrist_hash(board))
+            board.push(move)
+            length += 1
+        game_lengths.append(length)
+    # Ship planes as uint8 to cut inter-process traffic by 4x
+    planes = unpack_masks(np.array(masks, dtype=np.uint64).reshape(-1, 12))
+    meta = {'ply': np.array(plies, dtype=np.int16), 'elo': np.array(elos, dtype=np.int16)}
+    if with_keys:
+        meta['key'] = np.array(keys, dtype=np.uint64)
+    return planes, moves, game_lengths, meta
+
+def _take(columns, stop):
+    """Split a dict of equal-length columns at row stop."""
+    head = {name: col[:stop] for name, col in columns.items()}
+    tail = {name: col[stop:] for name, col in columns.items()}
+    return head, tail
+
+def stream_pgn_batches(pgn_file, batch_size=4096, workers=None, chunk_bytes=1 << 20, max_games=None,
+                       dtype=np.float32, with_meta=False, with_keys=False):
+    """Parse a PGN file in a process pool, yielding (boards, moves) batches.
+
+    Chunks are parsed in parallel but yielded in file order, and at most
+    2 * workers chunks are in flight, so memory stays bounded regardless of
+    file size. Every batch holds batch_size positions except possibly the last.
+    With with_meta=True, batches are (boards, moves, meta) where meta holds
+    game_id, ply and the side-to-move's elo per position, plus the Zobrist
+    key of each position when with_keys=True.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = iter(find_chunk_offsets(pgn_file, chunk_bytes))
+    pending = []
+    pending_count = 0
+    games_seen = 0
+
+    def emit(columns):
+        boards = columns.pop('boards').astype(dtype)
+        moves = list(columns.pop('moves'))
+        return (boards, moves, columns) if with_meta else (boards, moves)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+
+        def submit_next():
+            for start, end in chunks:
+                in_flight.append(executor.submit(_parse_chunk, (pgn_file, start, end, with_keys)))
+                return
+
+        for _ in range(2 * workers):
+            submit_next()
+
+        while in_flight:
+            planes, moves, game_lengths, meta = in_flight.popleft().result()
+            if max_games is not None and games_seen + len(game_lengths) >= max_games:
+                game_lengths = game_lengths[:max_games - games_seen]
+                for future in in_flight:
+                    future.cancel()
+                in_flight.clear()
+            else:
+                submit_next()
+
+            count = sum(game_lengths)
+            game_ids = np.repeat(np.arange(games_seen, games_seen + len(game_lengths), dtype=np.int64), game_lengths)
+            games_seen += len(game_lengths)
+            STATS.incr('pgn_games', len(game_lengths))
+            STATS.incr('pgn_positions', count)
+            columns = {'boards': planes, 'moves': np.array(moves, dtype=object), 'game_id': game_ids}
+            columns.update(meta)
+            columns, _ = _take(columns, count)
+
+            pending.append(columns)
+            pending_count += count
+            while pending_count >= batch_size:
+                merged = {name: np.concatenate([p[name] for p in pending]) for name in pending[0]}
+                batch, rest = _take(merged, batch_size)
+                yield emit(batch)
+                pending = [rest]
+                pending_count -= batch_size
+
+    if pending_count:
+        yield emit({name: np.concatenate([p[name] for p in pending]) for name in pending[0]})
+
+DEDUP_RECORD = np.dtype([('key', '<u8'), ('label', '<i4'), ('planes', 'u1', (PACKED_BYTES,))])
+
+class PositionDeduplicator:
+    """Fold repeated (position, move) samples into one weighted sample.
+
+    Samples are keyed on the Zobrist hash and spilled to num_buckets files
+    by key, so only one bucket (about 1/num_buckets of the data) is ever
+    held in memory while folding. Each output sample carries the number of
+    times its move was played from that position as its weight, so the
+    weighted loss matches training on the raw duplicates.
+    """
+
+    def __init__(self, spill_dir, num_buckets=64):
+        self.spill_dir = spill_dir
+        self.num_buckets = num_buckets
+        self.num_added = 0
+        os.makedirs(spill_dir, exist_ok=True)
+        self.paths = [os.path.join(spill_dir, f"bucket-{i:04d}.bin") for i in range(num_buckets)]
+        self.files = [open(path, 'wb') for path in self.paths]
+
+    def add(self, keys, planes, labels):
+        """Spill a batch of (key, planes, label) samples to their buckets."""
+        records = np.empty(len(keys), dtype=DEDUP_RECORD)
+        records['key'] = keys
+        records['label'] = labels
+        records['planes'] = pack_planes(planes)
+        buckets = (records['key'] % np.uint64(self.num_buckets)).astype(np.int64)
+        order = np.argsort(buckets, kind='stable')
+        bounds = np.searchsorted(buckets[order], np.arange(self.num_buckets + 1))
+        for i in np.flatnonzero(np.diff(bounds)):
+            records[order[bounds[i]:bounds[i + 1]]].tofile(self.files[i])
+        self.num_added += len(records)
+
+    def results(self):
+        """Yield (packed_planes, labels, weights, keys) per bucket, deleting spill files as they are consumed."""
+        for f in self.files:
+            f.close()
+        for path in self.paths:
+            records = np.fromfile(path, dtype=DEDUP_RECORD)
+            os.remove(path)
+            if not len(records):
+                continue
+            records = records[np.lexsort((records['label'], records['key']))]
+            first = np.ones(len(records), dtype=bool)
+            first[1:] = (records['key'][1:] != records['key'][:-1]) | (records['label'][1:] != records['label'][:-1])
+            starts = np.flatnonzero(first)
+            weights = np.diff(np.append(starts, len(records))).astype(np.float32)
+            unique = records[starts]
+            yield unique['planes'], unique['label'], weights, unique['key']
+        os.rmdir(self.spill_dir)
 
 # Example usage
 if __name__ == "__main__":
-    pgn_file = r"E:\Project\Chess\lichess_elite_2023-08.pgn"
-    X, y = parse_pgn(pgn_file, max_games=1000)
-    y, move_to_idx = encode_moves(y)
-    
-    # Split into train and test sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Create data directory if it doesn't exist
-    import os
-    os.makedirs("data", exist_ok=True)
-    
-    # Save datasets
-    np.save("data/X_train.npy", X_train)
-    np.save("data/X_test.npy", X_test)
-    np.save("data/y_train.npy", y_train)
-    np.save("data/y_test.npy", y_test)
-    
-    # Save move mapping
-    pd.Series(move_to_idx).to_json("data/move_to_idx.json")
-    print(f"Processed {len(X)} board states with {len(move_to_idx)} unique moves.")
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a PGN file into sharded training data.")
+    parser.add_argument("pgn_file", nargs="?", default=r"E:\Project\Chess\lichess_elite_2023-08.pgn")
+    parser.add_argument("--out", default="data")
+    parser.add_argument("--max-games", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=1 << 20)
+    parser.add_argument("--test-every", type=int, default=5, help="Every Nth game goes to the test split")
+    parser.add_argument("--dedup", action="store_true", help="Fold repeated positions into weighted samples")
+    parser.add_argument("--buckets", type=int, default=64, help="Spill buckets used by --dedup")
+    parser.add_argument("--stats-interval", type=float, default=10.0,
+                        help="Seconds between lines in {out}/prepare_stats.jsonl")
+    parser.add_argument("--profile", default=None, help="Write a cProfile dump of the run to this path")
+    args = parser.parse_args()
+
+    attrs = {"move_vocab": f"uci-{NUM_MOVES}"}
+    train_writer = ShardWriter(os.path.join(args.out, "train"), shard_size=args.shard_size, attrs=attrs)
+    test_writer = ShardWriter(os.path.join(args.out, "test"), shard_size=args.shard_size, attrs=attrs)
+    stats_file = StatsFile(os.path.join(args.out, "prepare_stats.jsonl"), args.stats_interval, stage="prepare_data")
+    with profiled(args.profile):
+        if args.dedup:
+            train_dedup = PositionDeduplicator(os.path.join(args.out, "spill-train"), args.buckets)
+            test_dedup = PositionDeduplicator(os.path.join(args.out, "spill-test"), args.buckets)
+        for boards, moves, meta in stream_pgn_batches(args.pgn_file, max_games=args.max_games, workers=args.workers,
+                                                      dtype=np.uint8, with_meta=True, with_keys=args.dedup):
+            stats_file.maybe_write()
+            # The vocabulary is fixed, so labels from any batch, worker or run agree
+            labels = encode_ucis(moves)
+            known = labels >= 0
+            if not known.all():
+                boards, labels = boards[known], labels[known]
+                meta = {name: col[known] for name, col in meta.items()}
+            # Split by game rather than by position so test games are never seen in training
+            is_test = meta['game_id'] % args.test_every == 0
+            if args.dedup:
+                for dedup, mask in ((train_dedup, ~is_test), (test_dedup, is_test)):
+                    if mask.any():
+                        dedup.add(meta['key'][mask], boards[mask], labels[mask])
+                continue
+            for writer, mask in ((train_writer, ~is_test), (test_writer, is_test)):
+                if mask.any():
+                    writer.add(boards[mask], labels[mask], **{name: col[mask] for name, col in meta.items()})
+        if args.dedup:
+            for dedup, writer in ((train_dedup, train_writer), (test_dedup, test_writer)):
+                for planes, labels, weights, keys in dedup.results():
+                    writer.add(planes, labels, packed=True, weight=weights, key=keys)
+    stats_file.write()
+    train_manifest = train_writer.close()
+    test_manifest = test_writer.close()
+    if args.dedup:
+        raw = train_dedup.num_added + test_dedup.num_added
+        folded = train_manifest["num_examples"] + test_manifest["num_examples"]
+        print(f"Deduplicated {raw} positions into {folded} weighted samples.")
+
+    total = train_manifest["num_examples"] + test_manifest["num_examples"]
+    print(f"Processed {total} board states over a {NUM_MOVES}-move vocabulary.")
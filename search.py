@@ -0,0 +1,288 @@
+import logging
+import time
+from collections import namedtuple
+
+import chess
+import chess.polyglot
+import numpy as np
+
+from move_vocab import NUM_MOVES, index_to_move, move_index
+
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 0]  # Indexed by chess piece type
+MATE_SCORE = 100000
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+SearchResult = namedtuple('SearchResult', ['move', 'score', 'depth', 'nodes', 'elapsed', 'nps'])
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget runs out."""
+
+def evaluate(board):
+    """Static material evaluation in centipawns from the side to move's point of view."""
+    black, white = board.occupied_co
+    score = 0
+    for piece_type, mask in ((chess.PAWN, board.pawns), (chess.KNIGHT, board.knights), (chess.BISHOP, board.bishops),
+                             (chess.ROOK, board.rooks), (chess.QUEEN, board.queens)):
+        score += PIECE_VALUES[piece_type] * (chess.popcount(mask & white) - chess.popcount(mask & black))
+    return score if board.turn == chess.WHITE else -score
+
+class TranspositionTable:
+    """Fixed-size Zobrist-indexed table stored in NumPy arrays.
+
+    Each key maps to one slot (key & mask). A slot is overwritten when it is
+    empty, left over from an earlier search, or holds a shallower result,
+    so deep entries from the current search survive.
+    """
+
+    def __init__(self, size_log2=20):
+        size = 1 << size_log2
+        self.mask = size - 1
+        self.keys = np.zeros(size, dtype=np.uint64)
+        self.depths = np.full(size, -1, dtype=np.int16)
+        self.scores = np.zeros(size, dtype=np.int32)
+        self.flags = np.zeros(size, dtype=np.int8)
+        self.moves = np.full(size, -1, dtype=np.int16)
+        self.ages = np.zeros(size, dtype=np.uint8)
+        self.generation = 0
+
+    def new_search(self):
+        """Mark existing entries as stale so they are replaced first."""
+        self.generation = (self.generation + 1) % 256
+
+    def probe(self, key):
+        """Return (depth, score, flag, move index) for key, or None."""
+        slot = key & self.mask
+        if self.depths[slot] < 0 or int(self.keys[slot]) != key:
+            return None
+        return int(self.depths[slot]), int(self.scores[slot]), int(self.flags[slot]), int(self.moves[slot])
+
+    def store(self, key, depth, score, flag, move):
+        slot = key & self.mask
+        if (self.depths[slot] >= 0 and self.ages[slot] == self.generation
+                and int(self.keys[slot]) != key and self.depths[slot] > depth):
+            return
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.scores[slot] = score
+        self.flags[slot] = flag
+        self.moves[slot] = move
+        self.ages[slot] = self.generation
+
+    def clear(self):
+        self.depths[:] = -1
+
+def _to_tt(score, ply):
+    """Store mate scores relative to the node rather than the root."""
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+def _from_tt(score, ply):
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+class AlphaBetaSearch:
+    """Iterative-deepening alpha-beta search guided by the policy network.
+
+    Moves are ordered by transposition-table move, captures (MVV-LVA),
+    killer moves, network priors and the history heuristic. Priors are only
+    requested for nodes with at least policy_depth plies left, and when a
+    node's children will need them they are fetched in one batched forward
+    pass through policy.policies (see engine.MoveEngine).
+    """
+
+    def __init__(self, policy=None, tt_size_log2=20, policy_depth=2, max_depth=64):
+        self.policy = policy
+        self.tt = TranspositionTable(tt_size_log2)
+        self.policy_depth = policy_depth
+        self.max_depth = max_depth
+        self.history = np.zeros((2, NUM_MOVES), dtype=np.int64)
+        self.killers = [[None, None] for _ in range(max_depth + 1)]
+        self.nodes = 0
+        self.deadline = None
+
+    def best_move(self, board, time_limit=None):
+        """Return the best move found within time_limit seconds (1s by default)."""
+        return self.search(board, time_limit=time_limit or 1.0).move
+
+    def search(self, board, time_limit=1.0, max_depth=None):
+        """Search board by iterative deepening until time_limit or max_depth, returning a SearchResult."""
+        board = board.copy()
+        max_depth = min(max_depth or self.max_depth, self.max_depth)
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit else None
+        self.nodes = 0
+        self.tt.new_search()
+        self.history //= 2
+        self.killers = [[None, None] for _ in range(self.max_depth + 1)]
+
+        best = None
+        legal = list(board.legal_moves)
+        if not legal:
+            return SearchResult(None, 0, 0, 0, 0.0, 0.0)
+        result = SearchResult(legal[0], 0, 0, 0, 0.0, 0.0)
+        for depth in range(1, max_depth + 1):
+            try:
+                score = self._negamax(board, depth, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                break
+            entry = self.tt.probe(chess.polyglot.zobrist_hash(board))
+            if entry is not None and entry[3] >= 0:
+                best = index_to_move(entry[3])
+            elapsed = time.perf_counter() - start
+            result = SearchResult(best or legal[0], score, depth, self.nodes, elapsed, self.nodes / max(elapsed, 1e-9))
+            logging.info("depth %d score %d nodes %d nps %.0f best %s", depth, score, self.nodes, result.nps, result.move)
+            if abs(score) >= MATE_THRESHOLD:
+                break
+        elapsed = time.perf_counter() - start
+        return result._replace(nodes=self.nodes, elapsed=elapsed, nps=self.nodes / max(elapsed, 1e-9))
+
+    def _check_time(self):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    def _priors(self, board):
+        """Return {move: prior} from the policy network (served from its cache when prefetched)."""
+        moves, priors = self.policy.policies([board])[0]
+        return dict(zip(moves, priors))
+
+    def _order_moves(self, board, moves, tt_move, ply, depth):
+        priors = self._priors(board) if self.policy is not None and depth >= self.policy_depth else {}
+        killers = self.killers[ply]
+        history = self.history[int(board.turn)]
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                score = 1 << 40
+            elif board.is_capture(move):
+                victim = board.piece_type_at(move.to_square) or chess.PAWN  # En passant
+                attacker = board.piece_type_at(move.from_square)
+                score = (1 << 30) + 10 * PIECE_VALUES[victim] - PIECE_VALUES[attacker]
+            elif move in killers:
+                score = 1 << 29
+            else:
+                score = int(priors.get(move, 0.0) * (1 << 20)) + int(history[move_index(move)])
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def _prefetch_children(self, board, moves):
+        """Evaluate the policy for all children in one batched forward pass."""
+        children = []
+        for move in moves:
+            board.push(move)
+            children.append(board.copy(stack=False))
+            board.pop()
+        self.policy.policies(children)
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        self._check_time()
+        if ply > 0 and (board.is_fifty_moves() or board.is_repetition(2) or board.is_insufficient_material()):
+            return 0
+
+        key = chess.polyglot.zobrist_hash(board)
+        entry = self.tt.probe(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, entry_score, flag, move_idx = entry
+            tt_move = index_to_move(move_idx) if move_idx >= 0 else None
+            if ply > 0 and entry_depth >= depth:
+                entry_score = _from_tt(entry_score, ply)
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER and entry_score >= beta:
+                    return entry_score
+                if flag == UPPER and entry_score <= alpha:
+                    return entry_score
+
+        if depth <= 0 or ply >= self.max_depth:
+            return self._quiesce(board, alpha, beta, ply)
+
+        moves = list(board.legal_moves)
+        if not moves:
+            return -MATE_SCORE + ply if board.is_check() else 0
+        moves = self._order_moves(board, moves, tt_move, ply, depth)
+        if self.policy is not None and depth - 1 >= self.policy_depth:
+            self._prefetch_children(board, moves)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = moves[0]
+        for move in moves:
+            board.push(move)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not board.is_capture(move):
+                    killers = self.killers[ply]
+                    if move != killers[0]:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    self.history[int(board.turn), move_index(move)] += depth * depth
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, _to_tt(best_score, ply), flag, move_index(best_move))
+        return best_score
+
+    def _quiesce(self, board, alpha, beta, ply):
+        """Search captures only until the position is quiet."""
+        self._check_time()
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        captures = []
+        for move in board.generate_legal_captures():
+            victim = board.piece_type_at(move.to_square) or chess.PAWN
+            attacker = board.piece_type_at(move.from_square)
+            captures.append((10 * PIECE_VALUES[victim] - PIECE_VALUES[attacker], move))
+        captures.sort(key=lambda item: item[0], reverse=True)
+
+        for _, move in captures:
+            board.push(move)
+            score = -self._quiesce(board, -beta, -alpha, ply + 1)
+            board.pop()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search a position and report nodes per second.")
+    parser.add_argument("fen", nargs="?", default=chess.STARTING_FEN)
+    parser.add_argument("--time", type=float, default=2.0, help="Time budget in seconds")
+    parser.add_argument("--model", default=None, help="Policy model for move ordering (e.g. data/chess_model.h5)")
+    parser.add_argument("--mapping", default="data/idx_to_move.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    policy = None
+    if args.model:
+        from engine import MoveEngine
+        policy = MoveEngine(args.model, args.mapping)
+    result = AlphaBetaSearch(policy=policy).search(chess.Board(args.fen), time_limit=args.time)
+    print(f"Best move {result.move} (score {result.score}, depth {result.depth}, "
+          f"{result.nodes} nodes in {result.elapsed:.2f}s, {result.nps:,.0f} nps)")
@@ -0,0 +1,159 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+import numpy as np
+
+from board_encoding import board_masks
+from dataset import ShardWriter, merge_manifests, pack_masks
+from move_vocab import NUM_MOVES, move_index
+
+RESULT_VALUE = {"1-0": 1, "0-1": -1}  # From White's point of view; anything else is a draw
+
+def sample_move(moves, priors, temperature, rng):
+    """Pick a move from the policy: sampled with temperature, or the argmax when temperature is 0."""
+    if temperature <= 0:
+        return moves[int(np.argmax(priors))]
+    weights = np.power(np.asarray(priors, dtype=np.float64), 1.0 / temperature)
+    total = weights.sum()
+    if not total > 0:
+        return moves[int(rng.integers(len(moves)))]
+    return moves[int(rng.choice(len(moves), p=weights / total))]
+
+class _Game:
+    """One self-play game in progress and the positions recorded so far."""
+
+    def __init__(self, game_id):
+        self.game_id = game_id
+        self.board = chess.Board()
+        self.masks = []
+        self.labels = []
+
+def _flush(writer, pending):
+    """Encode the finished games in pending and append them to writer as one batch."""
+    if not pending:
+        return
+    masks = np.concatenate([game['masks'] for game in pending])
+    columns = {name: np.concatenate([game[name] for game in pending]) for name in pending[0] if name != 'masks'}
+    writer.add(pack_masks(masks), columns.pop('labels'), packed=True, **columns)
+    pending.clear()
+
+def _produce(args):
+    """Producer job: play games with the policy network and write them straight to shards.
+
+    Up to `concurrent` games advance in lockstep so every move is one
+    batched MoveEngine.policies call. Positions are stored as bitboards
+    while a game runs and bit-packed when it finishes.
+    """
+    (worker, workers, model_path, mapping_path, out_dir, games, concurrent, temperature, temperature_plies,
+     max_plies, test_every, shard_size, flush_rows, seed) = args
+    from engine import MoveEngine
+    engine = MoveEngine(model_path, mapping_path)
+    rng = np.random.default_rng([seed, worker])
+    prefix = f"selfplay-{worker:03d}"
+    attrs = {"move_vocab": f"uci-{NUM_MOVES}", "source": "selfplay", "model": model_path}
+    writers = {split: ShardWriter(os.path.join(out_dir, split), shard_size=shard_size, prefix=prefix, attrs=attrs,
+                                  manifest=f"{prefix}.manifest.json") for split in ("train", "test")}
+    pending = {"train": [], "test": []}
+    pending_rows = {"train": 0, "test": 0}
+
+    started = 0
+    active = []
+    positions = 0
+    while active or started < games:
+        while len(active) < concurrent and started < games:
+            active.append(_Game(worker + workers * started))  # Globally unique across producers
+            started += 1
+
+        still_playing = []
+        for game, (moves, priors) in zip(active, engine.policies([game.board for game in active])):
+            board = game.board
+            move = sample_move(moves, priors, temperature if board.ply() < temperature_plies else 0.0, rng)
+            game.masks.append(board_masks(board))
+            game.labels.append(move_index(move))
+            board.push(move)
+            if board.outcome(claim_draw=True) is None and board.ply() < max_plies:
+                still_playing.append(game)
+                continue
+
+            outcome = board.outcome(claim_draw=True)
+            white_value = RESULT_VALUE.get(outcome.result(), 0) if outcome is not None else 0
+            count = len(game.labels)
+            plies = np.arange(count, dtype=np.int16)
+            # Value target from the side to move: White moves on even plies
+            values = np.where(plies % 2 == 0, white_value, -white_value).astype(np.int8)
+            split = "test" if game.game_id % test_every == 0 else "train"
+            pending[split].append({
+                'masks': np.array(game.masks, dtype=np.uint64),
+                'labels': np.array(game.labels, dtype=np.int32),
+                'game_id': np.full(count, game.game_id, dtype=np.int64),
+                'ply': plies,
+                'value': values,
+            })
+            pending_rows[split] += count
+            positions += count
+            if pending_rows[split] >= flush_rows:
+                _flush(writers[split], pending[split])
+                pending_rows[split] = 0
+        active = still_playing
+
+    for split, writer in writers.items():
+        _flush(writer, pending[split])
+        writer.close()
+    return prefix, games, positions, engine.cache_stats()
+
+def generate(model_path, out_dir, games, mapping_path=None, workers=None, concurrent=64, temperature=1.0,
+             temperature_plies=30, max_plies=300, test_every=5, shard_size=1 << 20, flush_rows=1 << 14, seed=0):
+    """Play `games` self-play games across worker processes into out_dir/train and out_dir/test.
+
+    Every producer writes its own shard prefix and part manifest, which are
+    merged into each split's manifest at the end, so the result reads like
+    prepare_data.py output (plus a per-position 'value' field holding the
+    game result for the side to move).
+    """
+    workers = workers or os.cpu_count() or 1
+    shares = [games // workers + (worker < games % workers) for worker in range(workers)]
+    jobs = [(worker, workers, model_path, mapping_path, out_dir, share, concurrent, temperature, temperature_plies,
+             max_plies, test_every, shard_size, flush_rows, seed)
+            for worker, share in enumerate(shares) if share]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+        results = list(executor.map(_produce, jobs))
+    elapsed = time.perf_counter() - start
+
+    prefixes = [prefix for prefix, _, _, _ in results]
+    manifests = {split: merge_manifests(os.path.join(out_dir, split), [f"{p}.manifest.json" for p in prefixes])
+                 for split in ("train", "test")}
+    positions = sum(result[2] for result in results)
+    logging.info("Self-play: %d games, %d positions in %.1fs (%.2f games/s, %.0f positions/s)",
+                 games, positions, elapsed, games / elapsed, positions / elapsed)
+    return manifests
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate training shards from self-play games.")
+    parser.add_argument("--model", default="data/chess_model.h5")
+    parser.add_argument("--mapping", default="data/idx_to_move.json")
+    parser.add_argument("--out", default="data/selfplay")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="Producer processes (default: CPU count)")
+    parser.add_argument("--concurrent", type=int, default=64, help="Games batched together in each producer")
+    parser.add_argument("--temperature", type=float, default=1.0, help="Sampling temperature for opening moves")
+    parser.add_argument("--temperature-plies", type=int, default=30, help="Plies sampled before playing greedily")
+    parser.add_argument("--max-plies", type=int, default=300)
+    parser.add_argument("--test-every", type=int, default=5, help="Every Nth game goes to the test split")
+    parser.add_argument("--shard-size", type=int, default=1 << 20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    manifests = generate(args.model, args.out, args.games, mapping_path=args.mapping, workers=args.workers,
+                         concurrent=args.concurrent, temperature=args.temperature,
+                         temperature_plies=args.temperature_plies, max_plies=args.max_plies,
+                         test_every=args.test_every, shard_size=args.shard_size, seed=args.seed)
+    total = sum(manifest["num_examples"] for manifest in manifests.values())
+    print(f"Wrote {total} self-play positions to {args.out}.")
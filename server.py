@@ -0,0 +1,347 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+import numpy as np
+
+from instrumentation import STATS
+
+class InferenceBatcher:
+    """Share one MoveEngine between many asyncio callers.
+
+    best_move() queues a position and awaits its answer. A background task
+    takes the first waiting request, gathers more until max_batch are
+    queued or max_delay seconds have passed, and answers them all with one
+    MoveEngine.best_moves call on a single worker thread. The engine's
+    cache and input buffer are therefore only touched from that thread,
+    and the event loop keeps serving sockets during the forward pass.
+    Requests arriving meanwhile form the next batch.
+    """
+
+    def __init__(self, engine, max_batch=256, max_delay=0.005):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = None
+        self.batches = 0
+        self.positions = 0
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=True)
+
+    async def best_move(self, board):
+        """Return the engine's move for board (None when it has no legal moves)."""
+        future = asyncio.get_running_loop().create_future()
+        # The caller may push its move before the batch runs, so queue a snapshot
+        await self.queue.put((board.copy(stack=False), future))
+        return await future
+
+    async def _collect(self):
+        """Wait for one request, then gather up to max_batch before the deadline."""
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            boards = [board for board, _ in batch]
+            try:
+                with STATS.timer('server_batch'):
+                    moves = await loop.run_in_executor(self._executor, self.engine.best_moves, boards)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.positions += len(batch)
+            STATS.gauge('server_batch_size', len(batch))
+            for (_, future), move in zip(batch, moves):
+                if not future.done():  # The caller may have disconnected
+                    future.set_result(move)
+
+class Session:
+    """One human-vs-AI game. Slots keep the per-session overhead to the board itself."""
+
+    __slots__ = ('board', 'ai_color', 'last_active')
+
+    def __init__(self, ai_color):
+        self.board = chess.Board()
+        self.ai_color = ai_color
+        self.last_active = time.monotonic()
+
+def _outcome(board):
+    """board.outcome() plus draws by threefold repetition or the fifty-move rule.
+
+    outcome(claim_draw=True) also looks for a repetition one move ahead,
+    which pushes every legal move and dominated the server's CPU time.
+    """
+    outcome = board.outcome()
+    if outcome is None and board.is_repetition(3):
+        return chess.Outcome(chess.Termination.THREEFOLD_REPETITION, None)
+    if outcome is None and board.can_claim_fifty_moves():
+        return chess.Outcome(chess.Termination.FIFTY_MOVES, None)
+    return outcome
+
+def _game_state(session):
+    board = session.board
+    outcome = _outcome(board)
+    return {'fen': board.fen(), 'result': outcome.result() if outcome is not None else None}
+
+class GameServer:
+    """Many concurrent games answered by one InferenceBatcher.
+
+    handle() takes one request dict and returns one response dict:
+      {"op": "new", "color": "white"|"black"}  -> session id, plus the AI's
+                                                   first move when it plays White
+      {"op": "move", "session": id, "move": "e2e4"} -> the AI's reply
+      {"op": "close", "session": id}
+      {"op": "stats"}
+    Errors come back as {"error": message}; if the engine fails, the
+    human's move is taken back so it can be retried. Sessions idle for longer than
+    session_timeout seconds are dropped.
+    """
+
+    def __init__(self, batcher, max_sessions=10000, session_timeout=1800.0):
+        self.batcher = batcher
+        self.max_sessions = max_sessions
+        self.session_timeout = session_timeout
+        self.sessions = {}
+        self.next_id = 1
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.session_timeout
+        for session_id in [sid for sid, s in self.sessions.items() if s.last_active < cutoff]:
+            del self.sessions[session_id]
+
+    async def _ai_reply(self, session):
+        board = session.board
+        if board.turn != session.ai_color or _outcome(board) is not None:
+            return None
+        move = await self.batcher.best_move(board)
+        if move is None:
+            return None
+        board.push(move)
+        return move.uci()
+
+    async def handle(self, request):
+        op = request.get('op')
+        if op == 'new':
+            if len(self.sessions) >= self.max_sessions:
+                self._expire()
+                if len(self.sessions) >= self.max_sessions:
+                    return {'error': 'server is full'}
+            color = request.get('color', 'white')
+            if color not in ('white', 'black'):
+                return {'error': f"color must be white or black, not {color!r}"}
+            session_id = self.next_id
+            self.next_id += 1
+            session = self.sessions[session_id] = Session(chess.BLACK if color == 'white' else chess.WHITE)
+            try:
+                ai_move = await self._ai_reply(session)
+            except Exception:
+                logging.exception("AI opening move failed for session %d", session_id)
+                del self.sessions[session_id]
+                return {'error': 'engine failed, please retry'}
+            return {'session': session_id, 'ai_move': ai_move, **_game_state(session)}
+
+        if op == 'stats':
+            return {'sessions': len(self.sessions), 'batches': self.batcher.batches,
+                    'positions': self.batcher.positions, **STATS.snapshot()}
+
+        if op not in ('move', 'close'):
+            return {'error': f"unknown op {op!r}"}
+        session_id = request.get('session')
+        # JSON booleans are ints in Python, and lists or objects would not hash
+        session = self.sessions.get(session_id) if type(session_id) is int else None
+        if session is None:
+            return {'error': f"unknown session {session_id!r}"}
+        session.last_active = time.monotonic()
+        if op == 'close':
+            del self.sessions[session_id]
+            return {'closed': session_id}
+
+        board = session.board
+        if board.turn == session.ai_color:
+            return {'error': 'not your turn'}
+        uci = request.get('move')
+        if not isinstance(uci, str):
+            return {'error': f"move must be a UCI string, not {uci!r}"}
+        try:
+            move = board.parse_uci(uci)
+        except ValueError:
+            return {'error': f"illegal move {uci!r}"}
+        board.push(move)
+        try:
+            ai_move = await self._ai_reply(session)
+        except Exception:
+            # Take the move back, or the session would be stuck waiting on an AI reply that never comes
+            logging.exception("AI reply failed for session %d", session_id)
+            board.pop()
+            return {'error': 'engine failed, please retry the move'}
+        return {'ai_move': ai_move, **_game_state(session)}
+
+    async def serve_connection(self, reader, writer):
+        """JSON-lines protocol: one request object per line, one response line each."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    response = {'error': 'invalid JSON'}
+                else:
+                    if not isinstance(request, dict):
+                        response = {'error': 'request must be a JSON object'}
+                    else:
+                        try:
+                            response = await self.handle(request)
+                        except Exception:
+                            # A bad request must not drop the connection or the other games on it
+                            logging.exception("Request %r failed", request)
+                            response = {'error': 'internal error'}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def serve(engine, host="127.0.0.1", port=8765, max_batch=256, max_delay=0.005, max_sessions=10000):
+    """Run the JSON-lines TCP front end until cancelled."""
+    batcher = InferenceBatcher(engine, max_batch, max_delay).start()
+    game_server = GameServer(batcher, max_sessions=max_sessions)
+    tcp = await asyncio.start_server(game_server.serve_connection, host, port)
+    logging.info("Serving games on %s:%s", host, port)
+    try:
+        async with tcp:
+            await tcp.serve_forever()
+    finally:
+        await batcher.close()
+
+async def _simulate_session(game_server, moves, rng, latencies):
+    """Play random legal human moves against the server, recording each move's round-trip latency."""
+    response = await game_server.handle({'op': 'new', 'color': rng.choice(('white', 'black'))})
+    session_id = response['session']
+    board = chess.Board(response['fen'])
+    for _ in range(moves):
+        if response['result'] is not None:
+            await game_server.handle({'op': 'close', 'session': session_id})
+            response = await game_server.handle({'op': 'new', 'color': rng.choice(('white', 'black'))})
+            session_id = response['session']
+            board = chess.Board(response['fen'])
+            continue
+        move = rng.choice(list(board.legal_moves))
+        start = time.perf_counter()
+        response = await game_server.handle({'op': 'move', 'session': session_id, 'move': move.uci()})
+        latencies.append(time.perf_counter() - start)
+        board.push(move)
+        if response['ai_move'] is not None:
+            board.push_uci(response['ai_move'])
+    await game_server.handle({'op': 'close', 'session': session_id})
+
+async def load_test(engine, sessions=(1, 10, 100, 1000), moves=20, max_batch=256, max_delay=0.005, seed=0):
+    """Drive GameServer in-process with N concurrent simulated players for each N in sessions.
+
+    Each player makes `moves` random human moves; a move's latency covers
+    queueing, batching and the AI reply. Returns one result per N with
+    moves/s, latency percentiles and the mean inference batch size.
+    """
+    results = []
+    for count in sessions:
+        batcher = InferenceBatcher(engine, max_batch, max_delay).start()
+        game_server = GameServer(batcher, max_sessions=count)
+        engine.cache.clear()  # Each run starts cold, like a fresh server
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*(_simulate_session(game_server, moves, random.Random(seed * 100003 + i), latencies)
+                               for i in range(count)))
+        elapsed = time.perf_counter() - start
+        await batcher.close()
+        latency_ms = np.array(latencies) * 1000
+        results.append({
+            'sessions': count,
+            'moves': len(latencies),
+            'seconds': elapsed,
+            'moves_per_sec': len(latencies) / elapsed,
+            'p50_ms': float(np.percentile(latency_ms, 50)),
+            'p99_ms': float(np.percentile(latency_ms, 99)),
+            'mean_batch': batcher.positions / max(batcher.batches, 1),
+        })
+        logging.info("Load test: %s", results[-1])
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve many concurrent games over a JSON-lines TCP socket.")
+    parser.add_argument("--model", default="data/chess_model.h5")
+    parser.add_argument("--mapping", default="data/idx_to_move.json")
+    parser.add_argument("--book", default=None, help="Polyglot opening book (see opening_book.py)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=256, help="Largest inference batch")
+    parser.add_argument("--max-delay-ms", type=float, default=5.0, help="Longest wait for a batch to fill")
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--load-test", default=None, metavar="N,N,...",
+                        help="Instead of serving, benchmark these concurrent session counts, e.g. 1,10,100,1000")
+    parser.add_argument("--moves", type=int, default=20, help="Moves per simulated player in the load test")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    from engine import MoveEngine
+    book = None
+    if args.book:
+        from opening_book import OpeningBook
+        book = OpeningBook(args.book)
+    engine = MoveEngine(args.model, args.mapping, max_batch=args.max_batch, book=book)
+
+    if args.load_test:
+        counts = [int(n) for n in args.load_test.split(",")]
+        results = asyncio.run(load_test(engine, counts, moves=args.moves, max_batch=args.max_batch,
+                                        max_delay=args.max_delay_ms / 1000))
+        print(f"{'sessions':>8} {'moves':>7} {'moves/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6}")
+        for r in results:
+            print(f"{r['sessions']:>8} {r['moves']:>7} {r['moves_per_sec']:>9,.0f} {r['p50_ms']:>8.1f} "
+                  f"{r['p99_ms']:>8.1f} {r['mean_batch']:>6.1f}")
+    else:
+        try:
+            asyncio.run(serve(engine, args.host, args.port, args.max_batch, args.max_delay_ms / 1000,
+                              args.max_sessions))
+        except KeyboardInterrupt:
+            pass
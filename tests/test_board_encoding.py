@@ -0,0 +1,15 @@
+import numpy as np
+
+from board_encoding import PLANES, board_to_tensor, board_to_tensor_loop, boards_to_tensor, random_boards
+
+def test_board_to_tensor_matches_loop():
+    for board in random_boards(100, seed=3):
+        assert np.array_equal(board_to_tensor(board), board_to_tensor_loop(board))
+
+def test_boards_to_tensor_matches_loop_and_reuses_buffer():
+    boards = random_boards(50, seed=4)
+    out = np.empty((64, PLANES, 8, 8), dtype=np.float32)
+    batch = boards_to_tensor(boards, out=out)
+    assert batch.shape == (50, PLANES, 8, 8)
+    assert np.shares_memory(batch, out)
+    assert np.array_equal(batch, np.stack([board_to_tensor_loop(board) for board in boards]))
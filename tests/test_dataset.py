@@ -0,0 +1,31 @@
+import numpy as np
+
+from board_encoding import board_masks, boards_to_tensor, random_boards
+from dataset import PACKED_BYTES, ShardedDataset, ShardWriter, pack_masks, pack_planes, unpack_planes
+
+def test_pack_planes_round_trip():
+    planes = boards_to_tensor(random_boards(40, seed=5))
+    packed = pack_planes(planes)
+    assert packed.shape == (40, PACKED_BYTES)
+    assert np.array_equal(unpack_planes(packed), planes)
+
+def test_pack_masks_matches_pack_planes():
+    boards = random_boards(40, seed=6)
+    masks = np.array([board_masks(board) for board in boards], dtype=np.uint64)
+    assert np.array_equal(pack_masks(masks), pack_planes(boards_to_tensor(boards)))
+
+def test_read_across_shard_boundaries(tmp_path):
+    planes = boards_to_tensor(random_boards(25, seed=7))
+    labels = np.arange(25)
+    with ShardWriter(str(tmp_path), shard_size=10) as writer:
+        writer.add(planes[:7], labels[:7])
+        writer.add(planes[7:], labels[7:])
+
+    dataset = ShardedDataset(str(tmp_path))
+    assert len(dataset) == 25
+    assert [shard["count"] for shard in dataset.shards] == [10, 10, 5]
+    rows = dataset.read(5, 22)
+    assert rows["labels"].tolist() == list(range(5, 22))
+    assert np.array_equal(unpack_planes(rows["planes"]), planes[5:22])
+    batches = list(dataset.iter_batches(8))
+    assert np.concatenate([batch["labels"] for batch in batches]).tolist() == list(range(25))
@@ -0,0 +1,33 @@
+import chess
+import numpy as np
+
+from board_encoding import random_boards
+from move_vocab import MOVE_UCI, NUM_MOVES, encode_moves, encode_ucis, index_to_move, move_index
+
+def test_vocabulary_size():
+    assert NUM_MOVES == 1968
+    assert len(set(MOVE_UCI)) == NUM_MOVES
+
+def test_round_trip_random_legal_moves():
+    for board in random_boards(200, seed=1):
+        for move in board.legal_moves:
+            index = move_index(move)
+            assert 0 <= index < NUM_MOVES
+            assert index_to_move(index) == move
+            assert MOVE_UCI[index] == move.uci()
+
+def test_promotions_and_castling_are_in_vocabulary():
+    for uci in ("e7e8q", "e7e8n", "e7d8r", "b2a1b", "e1g1", "e8c8"):
+        move = chess.Move.from_uci(uci)
+        assert index_to_move(move_index(move)) == move
+
+def test_encoders_agree():
+    board = random_boards(1, seed=2)[0]
+    moves = list(board.legal_moves)
+    indices = [move_index(move) for move in moves]
+    assert encode_moves(moves).tolist() == indices
+    assert encode_ucis([move.uci() for move in moves]).tolist() == indices
+
+def test_unknown_moves_encode_to_minus_one():
+    assert encode_ucis(["0000", "a1a1", "e2e4"]).tolist()[:2] == [-1, -1]
+    assert encode_ucis([]).dtype == np.int32
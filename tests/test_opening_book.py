@@ -0,0 +1,58 @@
+import chess
+import chess.polyglot
+import numpy as np
+
+from opening_book import BOOK_ENTRY, OpeningBook, decode_move, encode_move
+
+def test_castling_is_encoded_as_king_takes_rook():
+    board = chess.Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    for uci, rook in (("e1g1", chess.H1), ("e1c1", chess.A1)):
+        move = chess.Move.from_uci(uci)
+        raw = encode_move(board, move)
+        assert raw & 63 == rook
+        assert (raw >> 6) & 63 == chess.E1
+        assert decode_move(board, raw) == move
+
+    board.turn = chess.BLACK
+    for uci in ("e8g8", "e8c8"):
+        move = chess.Move.from_uci(uci)
+        assert decode_move(board, encode_move(board, move)) == move
+
+def test_promotion_round_trip():
+    board = chess.Board("3r3k/4P3/8/8/8/8/8/4K3 w - - 0 1")
+    for uci, code in (("e7e8n", 1), ("e7e8b", 2), ("e7e8r", 3), ("e7e8q", 4), ("e7d8q", 4)):
+        move = chess.Move.from_uci(uci)
+        raw = encode_move(board, move)
+        assert raw >> 12 == code
+        assert decode_move(board, raw) == move
+
+def test_plain_move_round_trip():
+    board = chess.Board()
+    move = chess.Move.from_uci("g1f3")
+    assert decode_move(board, encode_move(board, move)) == move
+
+def write_book(path, board, moves_and_weights):
+    entries = np.zeros(len(moves_and_weights), dtype=BOOK_ENTRY)
+    entries['key'] = chess.polyglot.zobrist_hash(board)
+    entries['move'] = [encode_move(board, chess.Move.from_uci(uci)) for uci, _ in moves_and_weights]
+    entries['weight'] = [weight for _, weight in moves_and_weights]
+    entries.tofile(path)
+
+def test_choose_move_with_all_zero_weights(tmp_path):
+    board = chess.Board()
+    path = str(tmp_path / "book.bin")
+    write_book(path, board, [("e2e4", 0), ("d2d4", 0)])
+
+    assert OpeningBook(path).choose_move(board) is None  # Weight-0 moves are skipped by default
+    book = OpeningBook(path, min_weight=0, seed=0)
+    chosen = {book.choose_move(board).uci() for _ in range(50)}
+    assert chosen == {"e2e4", "d2d4"}
+
+def test_choose_move_follows_weights(tmp_path):
+    board = chess.Board()
+    path = str(tmp_path / "book.bin")
+    write_book(path, board, [("e2e4", 5), ("d2d4", 0)])
+
+    book = OpeningBook(path, min_weight=0, seed=0)
+    assert {book.choose_move(board).uci() for _ in range(50)} == {"e2e4"}
+    assert book.choose_move(board, weighted=False).uci() == "e2e4"
@@ -0,0 +1,64 @@
+import asyncio
+
+import chess
+
+from server import GameServer, InferenceBatcher
+
+class FakeEngine:
+    """Plays the first legal move, or raises while failing is set."""
+
+    def __init__(self):
+        self.failing = False
+
+    def best_moves(self, boards):
+        if self.failing:
+            raise RuntimeError("inference failed")
+        return [next(iter(board.legal_moves), None) for board in boards]
+
+def run_with_server(engine, play):
+    async def main():
+        batcher = InferenceBatcher(engine, max_delay=0).start()
+        try:
+            return await play(GameServer(batcher))
+        finally:
+            await batcher.close()
+    return asyncio.run(main())
+
+def test_failed_ai_reply_takes_back_the_move():
+    engine = FakeEngine()
+
+    async def play(game_server):
+        session_id = (await game_server.handle({'op': 'new', 'color': 'white'}))['session']
+        engine.failing = True
+        failed = await game_server.handle({'op': 'move', 'session': session_id, 'move': 'e2e4'})
+        fen_after_failure = game_server.sessions[session_id].board.fen()
+        engine.failing = False
+        retried = await game_server.handle({'op': 'move', 'session': session_id, 'move': 'e2e4'})
+        return failed, fen_after_failure, retried
+
+    failed, fen_after_failure, retried = run_with_server(engine, play)
+    assert 'error' in failed
+    assert fen_after_failure == chess.STARTING_FEN
+    assert retried['ai_move'] is not None
+    assert 'error' not in retried
+
+def test_failed_opening_move_drops_the_session():
+    engine = FakeEngine()
+    engine.failing = True
+
+    async def play(game_server):
+        response = await game_server.handle({'op': 'new', 'color': 'black'})
+        return response, len(game_server.sessions)
+
+    response, sessions = run_with_server(engine, play)
+    assert 'error' in response
+    assert sessions == 0
+
+def test_malformed_session_ids_are_rejected():
+    async def play(game_server):
+        await game_server.handle({'op': 'new', 'color': 'white'})
+        return [await game_server.handle({'op': 'move', 'session': sid, 'move': 'e2e4'})
+                for sid in (True, [1], {'a': 1}, "1")]
+
+    for response in run_with_server(FakeEngine(), play):
+        assert response['error'].startswith('unknown session')
@@ -1,9 +1,18 @@
+import argparse
+import time
+
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras import layers, models
 import pandas as pd
 
-def build_model(num_moves):
+from dataset import PACKED_BYTES, PLANE_SHAPE, ShardedDataset
+from instrumentation import STATS, StatsFile, profiled
+from move_vocab import MOVE_UCI, NUM_MOVES
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+def build_model(num_moves=NUM_MOVES):
     """Build a neural network for chess move prediction."""
     model = models.Sequential([
         layers.Input(shape=(12, 8, 8)),
@@ -17,29 +26,141 @@ def build_model(num_moves):
     model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
     return model
 
-# Load data
-X_train = np.load("data/X_train.npy")
-y_train = np.load("data/y_train.npy")
-X_test = np.load("data/X_test.npy")
-y_test = np.load("data/y_test.npy")
-move_to_idx = pd.read_json("data/move_to_idx.json", typ='series')
-
-# Build and train model
-model = build_model(len(move_to_idx))
-model.summary()
-
-model.fit(
-    X_train, y_train,
-    validation_data=(X_test, y_test),
-    epochs=10,
-    batch_size=32,
-    verbose=1
-)
-
-# Save model
-model.save("data/chess_model.h5")
-
-# Save move mapping for inference
-idx_to_move = {v: k for k, v in move_to_idx.items()}
-pd.Series(idx_to_move).to_json("data/idx_to_move.json")
-print("Model training complete and saved as data/chess_model.h5")
\ No newline at end of file
+def unpack_planes_tf(packed):
+    """Unpack (B, 96) little-endian bit-packed uint8 rows into (B, 12, 8, 8) float32 planes."""
+    shifts = tf.constant([0, 1, 2, 3, 4, 5, 6, 7], dtype=tf.uint8)
+    bits = tf.bitwise.bitwise_and(tf.bitwise.right_shift(packed[..., tf.newaxis], shifts), 1)
+    return tf.cast(tf.reshape(bits, (-1,) + PLANE_SHAPE), tf.float32)
+
+def make_dataset(data_dir, batch_size=1024, shuffle=True, shuffle_buffer=1 << 16, read_rows=8192, seed=None):
+    """Build a tf.data pipeline streaming (planes, labels) batches from a sharded dataset.
+
+    Shards are read as memory-mapped blocks of read_rows positions in parallel,
+    shuffled at block level and again through a bounded shuffle_buffer, then
+    batched, unpacked and prefetched. Deduplicated datasets that carry a
+    weight field yield (planes, labels, weights) instead.
+    """
+    source = ShardedDataset(data_dir)
+    fields = ["planes", "labels"] + (["weight"] if "weight" in source.fields else [])
+    dtypes = {"planes": tf.uint8, "labels": tf.int32, "weight": tf.float32}
+    blocks = [(i, start) for i, shard in enumerate(source.shards) for start in range(0, shard["count"], read_rows)]
+    # An empty split (e.g. no test games under a small --max-games) gives an empty dataset
+    shard_ids = np.array([i for i, _ in blocks], dtype=np.int64)
+    starts = np.array([start for _, start in blocks], dtype=np.int64)
+
+    def read_block(i, start):
+        hi = min(start + read_rows, source.shards[i]["count"])
+        return tuple(np.asarray(source.shard(i, field)[start:hi]) for field in fields)
+
+    def load(i, start):
+        columns = tf.numpy_function(read_block, [i, start], [dtypes[field] for field in fields])
+        columns[0].set_shape((None, PACKED_BYTES))
+        for column in columns[1:]:
+            column.set_shape((None,))
+        return tuple(columns)
+
+    ds = tf.data.Dataset.from_tensor_slices((shard_ids, starts))
+    if shuffle:
+        ds = ds.shuffle(max(len(blocks), 1), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.map(load, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+    ds = ds.unbatch()
+    if shuffle:
+        ds = ds.shuffle(shuffle_buffer, seed=seed)
+    ds = ds.batch(batch_size)
+    ds = ds.map(lambda planes, *rest: (unpack_planes_tf(planes),) + rest, num_parallel_calls=AUTOTUNE)
+    return ds.prefetch(AUTOTUNE), len(source)
+
+class ThroughputLogger(tf.keras.callbacks.Callback):
+    """Report training examples/sec for each epoch."""
+
+    def __init__(self, examples_per_epoch):
+        super().__init__()
+        self.examples_per_epoch = examples_per_epoch
+        self.start = None
+        self.end = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        # Stop the clock at the last training step so validation time is excluded
+        self.end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = (self.end or time.perf_counter()) - self.start
+        rate = self.examples_per_epoch / elapsed
+        if logs is not None:
+            logs['examples_per_sec'] = rate
+        print(f"Epoch {epoch + 1}: {self.examples_per_epoch} examples in {elapsed:.1f}s ({rate:,.0f} examples/sec)")
+
+class StatsLogger(tf.keras.callbacks.Callback):
+    """Time every training step into STATS and append periodic snapshots to a StatsFile."""
+
+    def __init__(self, stats_file, batch_size, examples_per_epoch):
+        super().__init__()
+        self.stats_file = stats_file
+        self.batch_size = batch_size
+        self.examples_per_epoch = examples_per_epoch
+        self.remaining = examples_per_epoch
+        self.epoch = 0
+        self.batch_start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch = epoch
+        self.remaining = self.examples_per_epoch
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self.batch_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        STATS.record('train_step', time.perf_counter() - self.batch_start)
+        # The last batch of an epoch is usually partial
+        examples = min(self.batch_size, self.remaining)
+        self.remaining -= examples
+        STATS.incr('train_examples', examples)
+        self.stats_file.maybe_write(epoch=self.epoch, batch=batch, loss=float((logs or {}).get('loss', float('nan'))))
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.stats_file.write(epoch=epoch, **{name: float(value) for name, value in (logs or {}).items()})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the move prediction model on sharded data.")
+    parser.add_argument("--data", default="data")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--shuffle-buffer", type=int, default=1 << 16)
+    parser.add_argument("--stats-interval", type=float, default=30.0,
+                        help="Seconds between lines in {data}/train_stats.jsonl")
+    parser.add_argument("--profile", default=None, help="Write a cProfile dump of training to this path")
+    args = parser.parse_args()
+
+    # Load data
+    train_data, num_train = make_dataset(f"{args.data}/train", args.batch_size, shuffle_buffer=args.shuffle_buffer)
+    test_data, num_test = make_dataset(f"{args.data}/test", args.batch_size, shuffle=False)
+    if not num_train:
+        parser.error(f"{args.data}/train holds no examples; run prepare_data.py with more games")
+    if not num_test:
+        print(f"{args.data}/test is empty; training without validation.")
+        test_data = None
+
+    # Build and train model
+    model = build_model(NUM_MOVES)
+    model.summary()
+
+    stats_file = StatsFile(f"{args.data}/train_stats.jsonl", args.stats_interval, stage="train")
+    with profiled(args.profile):
+        model.fit(
+            train_data,
+            validation_data=test_data,
+            epochs=args.epochs,
+            callbacks=[ThroughputLogger(num_train), StatsLogger(stats_file, args.batch_size, num_train)],
+            verbose=1
+        )
+
+    # Save model
+    model.save(f"{args.data}/chess_model.h5")
+
+    # Save move mapping for inference
+    idx_to_move = dict(enumerate(MOVE_UCI))
+    pd.Series(idx_to_move).to_json(f"{args.data}/idx_to_move.json")
+    print(f"Model training complete and saved as {args.data}/chess_model.h5")